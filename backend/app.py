@@ -10,13 +10,17 @@ FLASK BASICS:
 - @app.route("/endpoint", methods=["GET"]) decorator defines URL endpoints
 - Routes are functions that handle requests and return responses
 - jsonify() converts Python dicts to JSON responses automatically
+  (this app plugs in orjson, a much faster JSON library, behind jsonify())
 
 REST API ARCHITECTURE:
 This app exposes a REST (Representational State Transfer) API with endpoints
 that the frontend can call to:
 - Execute scripts (POST /api/execute)
 - Check task status (GET /api/tasks/<task_id>)
+- Check many tasks at once (POST /api/tasks/batch)
 - Retrieve logs (GET /api/tasks/<task_id>/logs)
+- Stream logs live (GET /api/tasks/<task_id>/logs/stream, Server-Sent Events)
+- Download logs as plain text (GET /api/tasks/<task_id>/logs/raw)
 - Get all tasks (GET /api/tasks)
 
 COMMUNICATION FLOW:
@@ -38,12 +42,28 @@ be on different domains/ports. Without it, browsers would block requests.
 """
 
 # IMPORTS: These bring in necessary functionality
-from flask import Flask, render_template, request, jsonify  # Web framework
+import os  # Environment variables
+
+# OPTIONAL GEVENT MODE: Set USE_GEVENT=1 to serve with gevent's WSGIServer.
+# gevent must patch the standard library (sockets, threads, time.sleep, ...)
+# BEFORE anything else imports it, so this has to run before the imports below.
+USE_GEVENT = os.getenv("USE_GEVENT", "0") == "1"
+if USE_GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, Response, abort, render_template, request, jsonify  # Web framework
+from flask.json.provider import JSONProvider  # Hook for swapping the JSON library
 from flask_cors import CORS  # Enables cross-origin requests
-import os  # File operations
-import json  # JSON handling
+import orjson  # Fast JSON encoding/decoding
+import time  # Sleeping between log stream checks
+from typing import List, NamedTuple, Optional, Tuple  # For type hints
 from pathlib import Path  # Modern file path handling
-from executor import executor  # Our task execution engine
+from executor import executor, TERMINAL_STATUSES  # Our task execution engine
+from config import API_HOST, API_PORT, FLASK_DEBUG, GEVENT_POOL_SIZE  # Server settings
+from config import MAX_TASKS_IN_MEMORY  # Largest page of tasks
+from config import MAX_REQUEST_BODY_SIZE  # Largest request body we will read
+from config import CORS_ORIGINS  # Sites allowed to call the API from a browser
 
 # ===========================================================================
 # INITIALIZATION
@@ -59,10 +79,57 @@ app = Flask(
     static_folder="../frontend/static"
 )
 
+
+class ORJSONProvider(JSONProvider):
+    """
+    Make jsonify() and request.get_json() use orjson instead of the json module.
+    
+    orjson encodes straight to bytes and is several times faster than the
+    standard library, which matters for large payloads like a task list or
+    a multi-megabyte log. Responses go out as those bytes with no extra
+    str -> bytes conversion.
+    """
+    
+    mimetype = "application/json"
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Same arguments as jsonify(): one value, several values, or keywords
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+
+# Use orjson for every jsonify() call and request JSON parsing
+app.json = ORJSONProvider(app)
+
+# Refuse request bodies over this size (413) before reading them
+# (read_json() reads bodies in one go, so this bounds the memory it uses)
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BODY_SIZE
+
 # Enable CORS (Cross-Origin Resource Sharing)
 # This allows frontend (http://localhost:3000) to make requests to backend
 # (http://localhost:5000) without browser blocking them as "unsafe"
-CORS(app)
+# - Only the API, and only for the origins listed in CORS_ORIGINS
+# - Only the methods and request headers the API actually uses
+# - max_age lets the browser remember a preflight (OPTIONS) answer for a
+#   day instead of sending one before every cross-origin POST
+# - expose_headers lets cross-origin scripts read our custom headers
+CORS(
+    app,
+    resources={r"/api/*": {"origins": CORS_ORIGINS}},
+    methods=["GET", "POST"],
+    allow_headers=["Content-Type", "If-None-Match"],
+    expose_headers=["ETag", "X-Log-Offset"],
+    max_age=86400,  # 24 hours
+)
 
 # ===========================================================================
 # CONFIGURATION
@@ -72,9 +139,206 @@ CORS(app)
 # Used to build paths to scripts
 BACKEND_DIR = Path(__file__).parent
 
-# Path to the sample script that users can execute
-# This is the demo script showing what scripts can do
-SAMPLE_SCRIPT = BACKEND_DIR / "sample_script.py"
+# Scripts users can execute: script_type (sent by the frontend) -> file name
+# in the backend directory. This is where you add new scripts.
+SCRIPTS = {
+    "sample": "sample_script.py",  # The demo script showing what scripts can do
+}
+
+
+def _build_script_registry(scripts: dict) -> dict:
+    """
+    Resolve every declared script to an absolute path, once at startup.
+    
+    Scripts don't move while the server runs, so checking that they exist
+    here saves a file-system lookup on every execute request. Missing
+    scripts are logged and left out, which makes requests for them fail
+    with "Unknown script type".
+    
+    RETURNS:
+        dict: script_type -> absolute path (str) of each script that exists
+    """
+    registry = {}
+    for script_type, filename in scripts.items():
+        try:
+            registry[script_type] = str((BACKEND_DIR / filename).resolve(strict=True))
+        except FileNotFoundError:
+            app.logger.warning("Script %r not found, %r disabled", filename, script_type)
+    return registry
+
+
+# script_type -> resolved script path, looked up on every execute request
+SCRIPT_REGISTRY = _build_script_registry(SCRIPTS)
+
+# ===========================================================================
+# REQUEST VALIDATION
+# ===========================================================================
+
+class ExecuteRequest(NamedTuple):
+    """A validated POST /api/execute request body."""
+    user_name: str          # Stripped, never empty
+    script_path: str        # Resolved from script_type via SCRIPT_REGISTRY
+    args: List[str]         # Command-line arguments for the script
+
+
+def parse_execute_request(data) -> Tuple[Optional[ExecuteRequest], Optional[str]]:
+    """
+    Validate a POST /api/execute body in a single pass.
+    
+    PARAMETERS:
+        data: Parsed JSON body (may be None or any JSON type)
+    
+    RETURNS:
+        tuple: (request, None) when valid, or (None, error_message)
+    
+    EXAMPLE:
+        req, error = parse_execute_request({"user_name": " Alice "})
+        # req.user_name == "Alice", req.args == [], error is None
+    """
+    if not isinstance(data, dict):
+        return None, "user_name is required"
+    
+    user_name = data.get("user_name")
+    if user_name is None:
+        return None, "user_name is required"
+    if not isinstance(user_name, str):
+        return None, "user_name must be a string"
+    if not user_name.strip():
+        return None, "user_name cannot be empty"
+    
+    # Paths were resolved (and checked to exist) at startup; an unknown
+    # type or a script whose file was missing are both rejected here
+    # (a list or object can't even be looked up: unhashable)
+    script_type = data.get("script_type", "sample")
+    script_path = SCRIPT_REGISTRY.get(script_type) if isinstance(script_type, str) else None
+    if script_path is None:
+        return None, "Unknown script type"
+    
+    # Arguments are passed straight to the script's command line
+    args = data.get("args", [])
+    if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+        return None, "args must be a list of strings"
+    
+    return ExecuteRequest(user_name.strip(), script_path, args), None
+
+
+def read_json():
+    """
+    Parse the request body as JSON with orjson.
+    
+    Unlike request.get_json(), this does not care about the Content-Type
+    header, and the raw body is not kept around after parsing
+    (cache=False), so it is held in memory only once.
+    
+    RETURNS:
+        The parsed JSON value, or None if the body is empty
+    
+    ERRORS:
+        - Aborts with 400 if the body isn't valid JSON
+        - Aborts with 413 if the body is over MAX_REQUEST_BODY_SIZE
+        (both answered in JSON by the error handlers at the end of this file)
+    
+    EXAMPLE:
+        data = read_json()   # {"user_name": "Alice"} -> dict
+    """
+    body = request.get_data(cache=False)
+    if not body:
+        return None
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        abort(400, "Request body must be valid JSON")
+
+# How long the log stream waits before checking a running task for new output
+LOG_STREAM_POLL_INTERVAL = 0.2  # seconds
+
+# How long a log stream may go without sending anything before it sends a
+# heartbeat. Writing is the only way to notice that the browser went away:
+# without it a stream of a quiet task would keep its server thread busy
+# until the task finished, long after the client disconnected.
+LOG_STREAM_HEARTBEAT_INTERVAL = 15  # seconds
+
+# Task list paging: tasks returned by GET /api/tasks when no limit is given,
+# and the most a client may ask for in one page
+DEFAULT_TASKS_PAGE_SIZE = 50
+MAX_TASKS_PAGE_SIZE = MAX_TASKS_IN_MEMORY
+
+# Maximum number of task IDs accepted by one batch status request
+# Keeps the work done per request bounded
+MAX_BATCH_IDS = 256
+
+# ===========================================================================
+# RESPONSE CACHING
+# ===========================================================================
+# Some responses never change, so we encode them to JSON once and reuse the
+# bytes instead of rebuilding and re-encoding the same dict on every request.
+#
+# NOTE: We cache the encoded BYTES, not Response objects. Flask and
+# flask-cors modify a Response's headers as it is sent, so a shared object
+# would pick up duplicate headers; wrapping cached bytes is cheap.
+#
+# CONDITIONAL GET (ETags):
+# The dashboard polls the same URLs over and over. Each polled response
+# carries an ETag built from the executor's change counters (see
+# TaskExecutor.version). The browser sends it back in If-None-Match; if
+# nothing changed we reply "304 Not Modified" with no body, and the browser
+# reuses its cached copy. No frontend code is needed for this.
+
+# Health check body (the same on every call)
+_HEALTH_BODY = b'{"status":"healthy"}\n'
+
+# Fixed error bodies, returned by error paths that can be hit very often
+# (e.g. a monitor polling a task that no longer exists)
+_TASK_NOT_FOUND_BODY = b'{"success":false,"error":"Task not found"}\n'
+_ENDPOINT_NOT_FOUND_BODY = b'{"success":false,"error":"Endpoint not found"}\n'
+_SERVER_ERROR_BODY = b'{"success":false,"error":"Internal server error"}\n'
+_QUEUE_FULL_BODY = b'{"success":false,"error":"Too many tasks queued, try again later"}\n'
+_BODY_TOO_LARGE_BODY = b'{"success":false,"error":"Request body too large"}\n'
+
+
+def _json_body(data) -> bytes:
+    """Encode data exactly as jsonify() would, returning the raw bytes."""
+    return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _json_bytes_response(body: bytes, status: int = 200):
+    """Wrap already-encoded JSON bytes in a response (no encoding work)."""
+    return app.response_class(body, status=status, mimetype="application/json")
+
+
+def _task_etag(task: dict) -> str:
+    """ETag for a single task: changes whenever the task changes."""
+    return f"{task['id']}:{task['version']}"
+
+
+def _not_modified(etag: str):
+    """
+    Return a "304 Not Modified" response if the client already has etag.
+    
+    Checked BEFORE building the response body, so unchanged polls skip
+    reading logs and encoding JSON entirely.
+    
+    RETURNS:
+        Response with status 304, or None if the client's copy is stale
+    """
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return None
+
+
+def _with_etag(response, etag: str):
+    """
+    Attach an ETag to a response.
+    
+    "Cache-Control: no-cache" tells the browser it may keep the response
+    but must check with us (sending If-None-Match) before reusing it.
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 # ===========================================================================
 # ROUTES - Main UI
@@ -114,12 +378,17 @@ def index():
 @app.route("/api/tasks", methods=["GET"])
 def get_tasks():
     """
-    API endpoint to retrieve all tasks.
+    API endpoint to retrieve tasks, newest first, one page at a time.
     
     This endpoint is called by the frontend to populate the task history table.
-    It returns a list of all tasks that have been created.
+    Only one page is returned so the response size stays bounded no matter
+    how many tasks exist.
     
     HTTP METHOD: GET (retrieve data, no side effects)
+    QUERY PARAMETERS:
+        limit (optional, default 50): Tasks per page (1 to MAX_TASKS_PAGE_SIZE)
+        before (optional): Task ID; returns the tasks created before it.
+                           Pass the last task ID of a page to get the next one.
     
     RETURNS:
         JSON response with structure:
@@ -133,7 +402,8 @@ def get_tasks():
         }
     
     EXAMPLE REQUEST:
-        GET /api/tasks
+        GET /api/tasks?limit=50
+        GET /api/tasks?limit=50&before=abc123...   (next page)
     
     EXAMPLE RESPONSE:
         {
@@ -149,17 +419,41 @@ def get_tasks():
             ]
         }
     
+    CACHING:
+        The response has an ETag that changes whenever ANY task changes.
+        If no task changed since the client's last poll, the reply is
+        "304 Not Modified" with no body.
+    
     ERROR HANDLING:
         - Returns 500 status code if something goes wrong
         - Always returns JSON with "success" field for client to check
     """
     try:
-        # Call the executor to get all tasks from memory
-        tasks = executor.get_all_tasks()
+        # Read the change counter BEFORE the tasks: if a task changes in
+        # between, the ETag is older than the data and the next poll simply
+        # fetches again (never the other way round)
+        etag = f"tasks:{executor.version}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+        
+        # Page size, clamped to a sane range (invalid values use the default)
+        limit = request.args.get("limit", DEFAULT_TASKS_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_TASKS_PAGE_SIZE))
+        before = request.args.get("before")
+        
+        # Call the executor to get one page of tasks from memory, each task
+        # already encoded as JSON (re-encoded only when it has changed)
+        rows = executor.get_tasks_page_json(limit, before)
         
-        # Return success response with all tasks
+        # Assemble the JSON body from the pre-encoded rows: no per-field
+        # encoding work on each poll
+        body = b'{"success":true,"tasks":[' + b",".join(rows) + b"]}\n"
+        response = _json_bytes_response(body)
+        
+        # Return success response with the page of tasks
         # 200 is HTTP status code for OK
-        return jsonify({"success": True, "tasks": tasks}), 200
+        return _with_etag(response, etag)
     
     except Exception as e:
         # If something goes wrong, return error response
@@ -167,6 +461,68 @@ def get_tasks():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/api/tasks/batch", methods=["POST"])
+def get_tasks_batch():
+    """
+    API endpoint to get the current state of several tasks in one request.
+    
+    A client watching K tasks would otherwise make K separate requests to
+    /api/tasks/<task_id> every refresh. This returns all of them at once.
+    
+    HTTP METHOD: POST (the ID list is sent in the body)
+    CONTENT-TYPE: application/json
+    
+    REQUEST BODY:
+        {
+            "ids": ["550e8400...", "6ba7b810..."]   # Up to MAX_BATCH_IDS IDs
+        }
+    
+    RETURNS:
+        JSON response mapping each found task ID to its task object.
+        IDs that don't exist are simply left out.
+        {
+            "success": true,
+            "tasks": {
+                "550e8400...": {task_details},
+                "6ba7b810...": {task_details}
+            }
+        }
+    
+    ERROR RESPONSES:
+        - 400 if the body isn't JSON, or "ids" is missing, not a list of
+          strings, or too long
+        - 413 if the body is over MAX_REQUEST_BODY_SIZE
+        - 500 if server error
+    """
+    # Outside the try: its 400/413 errors go to the error handlers
+    data = read_json()
+    
+    try:
+        ids = data.get("ids") if isinstance(data, dict) else None
+        
+        # Validate the ID list
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return jsonify({"success": False, "error": "ids must be a list of task IDs"}), 400
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {MAX_BATCH_IDS} ids per request"
+            }), 400
+        
+        # One locked lookup per ID, each task already encoded as JSON
+        rows = executor.get_tasks_json_by_id(ids)
+        
+        # Assemble the JSON body from the pre-encoded rows, like the task
+        # list does: the tasks themselves are not encoded again
+        body = b'{"success":true,"tasks":{' + b",".join(
+            orjson.dumps(task_id) + b":" + row for task_id, row in rows.items()
+        ) + b"}}\n"
+        return _json_bytes_response(body)
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route("/api/tasks/<task_id>", methods=["GET"])
 def get_task(task_id):
     """
@@ -186,13 +542,13 @@ def get_task(task_id):
         }
     
     EXAMPLE REQUEST:
-        GET /api/tasks/550e8400-e29b-41d4-a716-446655440000
+        GET /api/tasks/550e8400e29b41d4a716446655440000
     
     EXAMPLE RESPONSE:
         {
             "success": true,
             "task": {
-                "id": "550e8400-e29b-41d4-a716-446655440000",
+                "id": "550e8400e29b41d4a716446655440000",
                 "user_name": "Alice",
                 "status": "running",
                 "progress": 45,
@@ -201,21 +557,38 @@ def get_task(task_id):
             }
         }
     
+    CACHING:
+        The response has an ETag that changes whenever the task changes.
+        Polls that send a matching If-None-Match header get
+        "304 Not Modified" with no body. The task itself comes already
+        encoded from the executor, which encodes it again only after it
+        changes (see get_task_json()).
+    
     ERROR RESPONSES:
         - 404 if task not found
         - 500 if server error
     """
     try:
-        # Retrieve the task from executor
-        task = executor.get_task(task_id)
+        # Retrieve the task from executor, already encoded as JSON
+        found = executor.get_task_json(task_id)
         
         # Check if task exists
-        if not task:
+        if not found:
             # Return 404 Not Found if task doesn't exist
-            return jsonify({"success": False, "error": "Task not found"}), 404
+            return _json_bytes_response(_TASK_NOT_FOUND_BODY, 404)
+        
+        # Nothing changed since the client's copy: no body needed
+        # (the ETag uses the version the row was encoded at, so it always
+        # matches the body sent with it)
+        version, row = found
+        etag = f"{task_id}:{version}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
         
-        # Return the task with 200 OK status
-        return jsonify({"success": True, "task": task}), 200
+        # Wrap the encoded task in the response envelope, no re-encoding
+        body = b'{"success":true,"task":' + row + b"}\n"
+        return _with_etag(_json_bytes_response(body), etag)
     
     except Exception as e:
         # Handle unexpected errors
@@ -227,11 +600,13 @@ def get_task_logs(task_id):
     """
     API endpoint to retrieve the execution logs for a task.
     
-    The frontend calls this repeatedly while a script is running to get
-    the latest output. Logs are streamed in real-time to the user.
+    Returns the whole log by default. Clients polling a running task
+    should pass the "offset" from their previous response so only the
+    new output is sent, not the entire log again on every poll.
     
     HTTP METHOD: GET
     URL PARAMETER: <task_id> (the task ID)
+    QUERY PARAMETER: offset (optional, default 0) - byte position to read from
     
     PARAMETERS:
         task_id (str): Unique task identifier
@@ -240,45 +615,227 @@ def get_task_logs(task_id):
         JSON response with logs:
         {
             "success": true,
-            "logs": "Full log output as string..."
+            "logs": "Log output written after offset...",
+            "offset": 1234,    # Pass this as ?offset= on the next call
+            "eof": false       # true once the task finished (no more logs)
         }
     
     EXAMPLE REQUEST:
-        GET /api/tasks/550e8400-e29b-41d4-a716-446655440000/logs
+        GET /api/tasks/550e8400e29b41d4a716446655440000/logs
     
     EXAMPLE RESPONSE:
         {
             "success": true,
-            "logs": "[2024-11-16 10:30:01] Starting...\n[2024-11-16 10:30:02] Step 1\n..."
+            "logs": "[2024-11-16 10:30:01] Starting...\n[2024-11-16 10:30:02] Step 1\n...",
+            "offset": 82,
+            "eof": false
         }
     
+    CACHING:
+        The response has an ETag built from the task's version (which
+        changes whenever new output is logged) and the requested offset.
+        Unchanged polls get "304 Not Modified" with no body.
+    
     POLLING PATTERN:
-        Frontend calls this every 1 second via polling:
+        let offset = 0;
         setInterval(() => {
-            fetch('/api/tasks/abc123/logs')
+            fetch(`/api/tasks/abc123/logs?offset=${offset}`)
             .then(response => response.json())
-            .then(data => displayLogs(data.logs))
+            .then(data => { appendLogs(data.logs); offset = data.offset; })
         }, 1000)
+        
+        The dashboard itself uses /logs/stream instead, which pushes new
+        output without polling.
     
     ERROR RESPONSES:
         - 404 if task not found
         - 500 if server error
     """
     try:
-        # First check if task exists
+        # Byte offset the client already has (invalid values fall back to 0)
+        offset = request.args.get("offset", 0, type=int)
+        
+        # Look up the task first: its version decides whether the client's
+        # copy is current, before any of the log is read
         task = executor.get_task(task_id)
-        if not task:
-            return jsonify({"success": False, "error": "Task not found"}), 404
+        if task is None:
+            return _json_bytes_response(_TASK_NOT_FOUND_BODY, 404)
+        eof = task["status"] in TERMINAL_STATUSES
+        
+        # Nothing logged since the client's copy: send no body
+        etag = f"{_task_etag(task)}:{offset}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
         
-        # Get the log content from the executor
-        logs = executor.get_task_logs(task_id)
+        # Read only the log content written after the offset. The task
+        # snapshot above was taken before this read, so "eof" is never
+        # reported while output is still unread.
+        logs, next_offset = executor.read_task_log(task, offset)
         
         # Return logs with success status
-        return jsonify({"success": True, "logs": logs}), 200
+        return _with_etag(jsonify({
+            "success": True,
+            "logs": logs,
+            "offset": next_offset,
+            "eof": eof
+        }), etag), 200
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/api/tasks/<task_id>/logs/raw", methods=["GET"])
+def get_task_logs_raw(task_id):
+    """
+    API endpoint to retrieve a task's logs as plain text.
+    
+    Same content as /api/tasks/<task_id>/logs, but the log is sent as-is
+    instead of inside a JSON string. JSON would escape every newline and
+    quote in the log, and the browser would have to unescape it all again.
+    
+    HTTP METHOD: GET
+    URL PARAMETER: <task_id> (the task ID)
+    QUERY PARAMETER: offset (optional, default 0) - byte position to read from
+    CONTENT-TYPE: text/plain; charset=utf-8
+    
+    COMPRESSION:
+        If the client accepts gzip (browsers always do) and asks for the
+        whole log (offset 0), the response is gzip-compressed. Logs are
+        repetitive text, so this usually cuts the size 5-10x. The executor
+        compresses logs as they are written (and a finished task's log only
+        once), so requests don't pay for the compression.
+    
+    RESPONSE HEADERS:
+        X-Log-Offset: Byte offset to pass as ?offset= on the next call
+    
+    EXAMPLE REQUEST:
+        GET /api/tasks/550e8400e29b41d4a716446655440000/logs/raw
+    
+    EXAMPLE RESPONSE:
+        [2024-11-16 10:30:01] Starting sample script execution...
+        [2024-11-16 10:30:02] [1/10] Initializing application
+        ...
+    
+    ERROR RESPONSES:
+        - 404 if task not found (JSON body, like the other endpoints)
+        - 500 if server error
+    """
+    try:
+        offset = request.args.get("offset", 0, type=int)
+        use_gzip = offset <= 0 and "gzip" in request.accept_encodings
+        
+        # Look up the task first, so an up-to-date client gets its 304
+        # without the log being read (or compressed)
+        task = executor.get_task(task_id)
+        if task is None:
+            return _json_bytes_response(_TASK_NOT_FOUND_BODY, 404)
+        
+        # Compressed and plain copies are different bodies: distinct ETags
+        etag = f"{_task_etag(task)}:{offset}:{'gzip' if use_gzip else 'raw'}"
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+        
+        if use_gzip:
+            body, next_offset = executor.read_task_log_gzip(task)
+        else:
+            body, next_offset = executor.read_task_log_bytes(task, offset)
+        
+        response = app.response_class(body, status=200, mimetype="text/plain")
+        response.vary.add("Accept-Encoding")
+        response.headers["X-Log-Offset"] = str(next_offset)
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        return _with_etag(response, etag)
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+
+@app.route("/api/tasks/<task_id>/logs/stream", methods=["GET"])
+def stream_task_logs(task_id):
+    """
+    API endpoint that streams a task's logs using Server-Sent Events (SSE).
+    
+    Instead of the browser asking for the whole log every second, it opens
+    ONE long-lived connection and the server pushes only the NEW output as
+    it appears. This avoids re-sending the entire log on every poll.
+    
+    HTTP METHOD: GET
+    URL PARAMETER: <task_id> (the task ID)
+    CONTENT-TYPE: text/event-stream
+    
+    STREAM FORMAT:
+        Each message is a "data:" line holding JSON, followed by a blank line.
+        The first message carries the log snapshot so far, later messages
+        carry only the newly written output. "offset" is the byte position
+        reached, usable with GET /api/tasks/<task_id>/logs?offset=...:
+        
+            data: {"logs": "[2024-11-16 10:30:01] Starting...\n", "offset": 44}
+            
+            data: {"logs": "[2024-11-16 10:30:02] Step 1\n", "offset": 82}
+            
+            event: done
+            data: {}
+        
+        The final "done" event is sent once the task has finished and all
+        of its output has been delivered.
+        
+        While a task is quiet, a comment line (": keepalive") is sent every
+        LOG_STREAM_HEARTBEAT_INTERVAL seconds. EventSource ignores it; it
+        lets the server notice a client that has gone away.
+    
+    FRONTEND USAGE:
+        const source = new EventSource('/api/tasks/abc123/logs/stream');
+        source.onmessage = (e) => appendLogs(JSON.parse(e.data).logs);
+        source.addEventListener('done', () => source.close());
+    
+    ERROR RESPONSES:
+        - 404 if task not found
+    """
+    if not executor.get_task(task_id):
+        return _json_bytes_response(_TASK_NOT_FOUND_BODY, 404)
+    
+    def generate():
+        # Send everything logged so far as the first message
+        snapshot, offset = executor.get_task_logs_slice(task_id)
+        yield b"data: " + orjson.dumps({"logs": snapshot, "offset": offset}) + b"\n\n"
+        last_sent = time.monotonic()
+        
+        while True:
+            # Send only the output written since the last message. The
+            # status snapshot is taken BEFORE the read, so output written
+            # just before the task finished is still picked up here
+            # (a task that disappeared was finished and then evicted)
+            task, new_logs, offset = executor.get_task_with_logs(task_id, offset)
+            finished = task is None or task["status"] in TERMINAL_STATUSES
+            if new_logs:
+                yield b"data: " + orjson.dumps({"logs": new_logs, "offset": offset}) + b"\n\n"
+                last_sent = time.monotonic()
+            
+            if finished:
+                # Tell the browser to close the connection
+                yield b"event: done\ndata: {}\n\n"
+                return
+            
+            if not new_logs:
+                if time.monotonic() - last_sent >= LOG_STREAM_HEARTBEAT_INTERVAL:
+                    # Quiet for a while: if the client has disconnected,
+                    # this write fails and the server ends the stream
+                    yield b": keepalive\n\n"
+                    last_sent = time.monotonic()
+                time.sleep(LOG_STREAM_POLL_INTERVAL)
+    
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",  # Never cache a live stream
+            "X-Accel-Buffering": "no",    # Stop nginx from buffering events
+        },
+    )
+
 # ===========================================================================
 # ROUTES - Script Execution
 # ===========================================================================
@@ -291,7 +848,7 @@ def execute_script():
     This is the main endpoint that starts script execution. It:
     1. Validates input data
     2. Creates a task in the executor
-    3. Starts the script in a background thread
+    3. Queues the script for a background worker thread
     4. Returns the task ID to the client
     
     HTTP METHOD: POST (create/execute something)
@@ -331,7 +888,7 @@ def execute_script():
         {
             "success": true,
             "task": {
-                "id": "550e8400-e29b-41d4-a716-446655440000",
+                "id": "550e8400e29b41d4a716446655440000",
                 "user_name": "Alice",
                 "status": "pending",
                 "progress": 0,
@@ -343,72 +900,55 @@ def execute_script():
         1. Parse JSON from request body
         2. Validate required fields (user_name)
         3. Map script_type to script path
-        4. Create task with unique ID
-        5. Execute task in background thread
-        6. Return task to client immediately
-        7. Client polls /api/tasks/<id> for progress
+        4. Refuse the task if too many are already waiting to run
+        5. Create task with unique ID
+        6. Queue task for a background worker thread
+        7. Return task to client immediately
+        8. Client polls /api/tasks/<id> for progress and streams
+           /api/tasks/<id>/logs/stream for output
     
     ERROR CASES:
+        - 400: Body isn't valid JSON
         - 400: Missing required fields or invalid input
-        - 400: Script type unknown or file not found
+        - 400: args is not a list of strings
+        - 400: Script type unknown (or its file was missing at startup)
+        - 413: Body over MAX_REQUEST_BODY_SIZE
+        - 429: Too many tasks waiting for a worker (EXEC_QUEUE_MAX); the
+               client should retry later
         - 500: Unexpected server error
     """
+    # Get JSON data from request body
+    # This comes from the frontend's fetch() call
+    # (outside the try: its 400/413 errors go to the error handlers)
+    data = read_json()
+    
     try:
-        # Get JSON data from request body
-        # This comes from the frontend's fetch() call
-        data = request.get_json()
-        
-        # Validate that data exists and has required fields
-        if not data or "user_name" not in data:
-            # 400 Bad Request: client didn't send required data
-            return jsonify({"success": False, "error": "user_name is required"}), 400
-        
-        # Get and validate user name
-        user_name = data.get("user_name", "").strip()
-        if not user_name:
-            # User name is empty after stripping whitespace
-            return jsonify({"success": False, "error": "user_name cannot be empty"}), 400
-        
-        # Get the type of script to run (default to "sample")
-        script_type = data.get("script_type", "sample")
-        
-        # Get command-line arguments (default to empty list)
-        args = data.get("args", [])
-        
-        # ==================================================================
-        # Map script type to actual script file path
-        # ==================================================================
-        # This is where you add new scripts for users to execute
-        if script_type == "sample":
-            # Use the sample script
-            script_path = str(SAMPLE_SCRIPT)
-        else:
-            # Unknown script type
-            return jsonify({"success": False, "error": "Unknown script type"}), 400
-        
-        # ==================================================================
-        # Validate script file exists
-        # ==================================================================
-        if not os.path.exists(script_path):
-            return jsonify({
-                "success": False,
-                "error": f"Script not found: {script_path}"
-            }), 400
+        # Validate all fields and map script_type to its script path
+        # (user_name required, script_type known, args a list of strings)
+        req, error = parse_execute_request(data)
+        if error:
+            # 400 Bad Request: client sent missing or invalid data
+            return jsonify({"success": False, "error": error}), 400
         
         # ==================================================================
         # Create and execute task
         # ==================================================================
         
+        # Back-pressure: with every worker busy and the queue full, a new
+        # task would only wait longer. Say so now rather than pile it on.
+        if executor.queue_full():
+            response = _json_bytes_response(_QUEUE_FULL_BODY, 429)
+            response.headers["Retry-After"] = "5"
+            return response
+        
         # Create task in executor (generates unique ID)
-        task_id = executor.create_task(user_name, script_path, args)
+        # The new task comes back with it, ready to return to the client
+        task_id, task = executor.create_task(req.user_name, req.script_path, req.args)
         
-        # Start execution in background thread
+        # Queue it for a worker thread
         # This returns immediately; script runs in background
         executor.execute_task(task_id)
         
-        # Get the newly created task to return to client
-        task = executor.get_task(task_id)
-        
         # Return success with created task
         # 201 Created: standard HTTP status for resource creation
         return jsonify({"success": True, "task": task}), 201
@@ -445,13 +985,67 @@ def health_check():
     
     HTTP STATUS:
         200 OK (always)
+    
+    PERFORMANCE:
+        Monitors call this very often, so the body is encoded once at
+        startup (_HEALTH_BODY) rather than running jsonify() every time.
+        Plain probes don't even reach this function: health_fast_path()
+        answers them before Flask does any work (see below).
     """
-    return jsonify({"status": "healthy"}), 200
+    return _json_bytes_response(_HEALTH_BODY)
+
+
+# Headers for the fast path's response, built once
+_HEALTH_HEADERS = [
+    ("Content-Type", "application/json"),
+    ("Content-Length", str(len(_HEALTH_BODY))),
+]
+
+# The Flask application as a plain WSGI callable, wrapped below
+_flask_wsgi_app = app.wsgi_app
+
+
+def health_fast_path(environ, start_response):
+    """
+    WSGI wrapper that answers "GET /api/health" without going through Flask.
+    
+    WHY?
+    Load balancers and monitors can probe the health check many times a
+    second. Through Flask, every probe sets up a request context, matches
+    the URL against every route and builds a Response object, just to
+    send the same 21 bytes. Here it costs two dictionary lookups.
+    
+    Requests with an Origin header (made by a browser from another site)
+    still go through Flask, so they get their CORS headers as usual.
+    Everything else is passed straight to Flask.
+    """
+    if (environ.get("PATH_INFO") == "/api/health"
+            and environ.get("REQUEST_METHOD") == "GET"
+            and "HTTP_ORIGIN" not in environ):
+        start_response("200 OK", _HEALTH_HEADERS)
+        return [_HEALTH_BODY]
+    return _flask_wsgi_app(environ, start_response)
+
+
+# Every request now passes through health_fast_path() first
+# (app itself stays the WSGI entry point, for Gunicorn and app.run())
+app.wsgi_app = health_fast_path
 
 # ===========================================================================
 # ERROR HANDLERS - Handle HTTP Errors Gracefully
 # ===========================================================================
 
+@app.errorhandler(400)
+def bad_request(error):
+    """
+    Handle 400 Bad Request errors, e.g. a body read_json() couldn't parse.
+    
+    RETURNS:
+        JSON error response with the reason given to abort()
+    """
+    return jsonify({"success": False, "error": error.description}), 400
+
+
 @app.errorhandler(404)
 def not_found(error):
     """
@@ -461,8 +1055,22 @@ def not_found(error):
     
     RETURNS:
         JSON error response instead of HTML error page
+        (pre-encoded once: _ENDPOINT_NOT_FOUND_BODY)
     """
-    return jsonify({"success": False, "error": "Endpoint not found"}), 404
+    return _json_bytes_response(_ENDPOINT_NOT_FOUND_BODY, 404)
+
+
+@app.errorhandler(413)
+def body_too_large(error):
+    """
+    Handle 413 Request Entity Too Large errors.
+    
+    Called when a request body is over MAX_REQUEST_BODY_SIZE.
+    
+    RETURNS:
+        JSON error response (pre-encoded once: _BODY_TOO_LARGE_BODY)
+    """
+    return _json_bytes_response(_BODY_TOO_LARGE_BODY, 413)
 
 
 @app.errorhandler(500)
@@ -474,8 +1082,9 @@ def server_error(error):
     
     RETURNS:
         JSON error response with generic error message
+        (pre-encoded once: _SERVER_ERROR_BODY)
     """
-    return jsonify({"success": False, "error": "Internal server error"}), 500
+    return _json_bytes_response(_SERVER_ERROR_BODY, 500)
 
 # ===========================================================================
 # MAIN ENTRY POINT
@@ -483,18 +1092,33 @@ def server_error(error):
 
 if __name__ == "__main__":
     """
-    Run the Flask development server.
+    Run the web server.
     
     This only runs if the script is executed directly (not imported).
     
-    PARAMETERS:
-        debug=True: Enable auto-reload and detailed error pages (development only)
-        host="0.0.0.0": Listen on all network interfaces
-        port=5000: Listen on port 5000
+    SERVER MODES:
+        Default: Flask development server
+            debug=FLASK_DEBUG: Auto-reload and detailed error pages (development only)
+            host=API_HOST: Listen address (default "0.0.0.0", all interfaces)
+            port=API_PORT: Listen port (default 5000)
+            threaded=True: Each request gets its own thread, so one slow
+                           request (e.g. a log stream) doesn't block others
+            processes=1: One process, so every request sees the same tasks
+        
+        USE_GEVENT=1: gevent's WSGIServer
+            Each connection runs in a lightweight greenlet, so many browsers
+            polling status and holding open log streams are served at the
+            same time instead of queueing behind each other. At most
+            GEVENT_POOL (default 1000) connections are served at once.
+            Requires `pip install gevent`.
+            $ USE_GEVENT=1 GEVENT_POOL=2000 python app.py
     
     NOTE:
-        For production, use a proper WSGI server like Gunicorn:
-        $ gunicorn -w 4 -b 0.0.0.0:5000 app:app
+        For production, use Gunicorn. Settings (worker class, threads,
+        connections) are read from gunicorn.conf.py in this directory:
+        $ gunicorn app:app
+        Keep a single worker: tasks live in this process's memory, so a
+        second worker process would not see them.
     
     STARTUP MESSAGE:
         * Running on http://0.0.0.0:5000
@@ -504,4 +1128,29 @@ if __name__ == "__main__":
         - Press Ctrl+C in the terminal
         - Takes a moment to shut down gracefully
     """
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Tasks the previous server process never finished (see
+    # recover_interrupted(): done here, not when executor.py is imported)
+    executor.recover_interrupted()
+
+    try:
+        if USE_GEVENT:
+            from gevent.pool import Pool
+            from gevent.pywsgi import WSGIServer
+            print(f" * Serving with gevent on http://{API_HOST}:{API_PORT}")
+            WSGIServer(
+                (API_HOST, API_PORT),
+                app,
+                spawn=Pool(size=GEVENT_POOL_SIZE)  # Cap on concurrent connections
+            ).serve_forever()
+        else:
+            app.run(
+                debug=FLASK_DEBUG,
+                host=API_HOST,
+                port=API_PORT,
+                threaded=True,
+                processes=1
+            )
+    finally:
+        # Don't start queued tasks once the server is stopping
+        # (scripts already running are allowed to finish)
+        executor.shutdown()
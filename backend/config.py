@@ -27,8 +27,28 @@ SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", 5000))
 
+# Server Concurrency
+# Maximum simultaneous connections when running with USE_GEVENT=1
+GEVENT_POOL_SIZE = int(os.getenv("GEVENT_POOL", 1000))
+
 # Task Configuration
-MAX_LOG_SIZE = 10 * 1024 * 1024  # 10 MB
+# How many scripts may run at once; further submissions wait in a queue
+# (not tied to the CPU count: a worker thread only relays its script's
+# output, and the scripts themselves may well be waiting on I/O)
+EXEC_WORKERS = int(os.getenv("EXEC_WORKERS", 32))
+# How many submissions may wait in that queue before new ones are refused
+EXEC_QUEUE_MAX = int(os.getenv("EXEC_QUEUE_MAX", 100))
+MAX_LOG_SIZE = 10 * 1024 * 1024  # 10 MB; bigger logs aren't kept gzipped in memory
+# task["output"] keeps the last MAX_OUTPUT_IN_MEMORY characters of output,
+# and may grow to twice that before older output is dropped (the log file
+# keeps all of it), so allow up to 2x this per running task
+MAX_OUTPUT_IN_MEMORY = 1024 * 1024
+MAX_REQUEST_BODY_SIZE = 1024 * 1024  # 1 MB; larger request bodies get 413
+# Run scripts from bytecode compiled once per change of the script, instead
+# of having Python compile the source on every run. Off by default: the
+# script then sees __file__/sys.argv[0] ending in ".pyc" and sys.path[0]
+# pointing to the bytecode cache, so it can't import modules next to it.
+PRECOMPILE_SCRIPTS = os.getenv("PRECOMPILE_SCRIPTS", "False") == "True"
 TASK_TIMEOUT = 3600  # 1 hour
 
 # CORS Configuration
@@ -39,3 +59,5 @@ ENABLE_TASK_HISTORY = True
 ENABLE_LOG_DOWNLOAD = True
 ENABLE_LOG_COPY = True
 MAX_TASKS_IN_MEMORY = 100
+# SQLite file where every task is saved (history beyond memory, restarts)
+TASKS_DB = os.getenv("TASKS_DB", str(LOGS_DIR / "tasks.db"))
@@ -7,34 +7,114 @@ tracking, comprehensive logging, and task management.
 
 KEY CONCEPTS:
 - TaskExecutor: Main class that manages script execution
-- Threading: Runs scripts in background threads to keep API responsive
+- Threading: Runs scripts from a fixed pool of worker threads to keep the
+  API responsive; at most max_workers scripts run at once, the rest queue
 - Task State: Tracks status (pending, running, success, failed) of each task
 - Logging: Saves execution output to files for later retrieval
 
 WORKFLOW:
 1. User submits execution request via API
 2. Flask app calls create_task() to create a new task with unique ID
-3. Flask app calls execute_task() which starts a background thread
-4. Thread runs subprocess.Popen() to execute the Python script
-5. Output is streamed line-by-line and saved to log file
-6. Progress is updated as lines are received
+3. Flask app calls execute_task() which queues it for a worker thread
+4. Worker thread runs subprocess.Popen() to execute the Python script
+5. Output is streamed in small batches and saved to log file
+6. Progress is updated as output is received
 7. Frontend polls the API to get status and logs in real-time
 8. Task is marked complete when process finishes
 
+MEMORY LIMIT:
+- At most max_tasks (MAX_TASKS_IN_MEMORY) tasks are kept; when a new task
+  would exceed it, the oldest FINISHED task is forgotten (its log file stays)
+- Running/pending tasks are never dropped
+- A task's "output" holds at least the last MAX_OUTPUT_IN_MEMORY characters
+  of its output and at most twice that: once it passes 2x, all but the last
+  MAX_OUTPUT_IN_MEMORY are dropped in one go (trimming on every batch would
+  copy the whole output each time). So a script that runs for days can't
+  use up the memory. The log file always has the complete output.
+- The compressed copy of a log kept for downloads (see _GzipLog) is only
+  kept while the log is at most MAX_LOG_SIZE bytes; bigger logs are
+  compressed when they are requested instead.
+
+PERSISTENCE (optional):
+- Given a TaskStore (see task_store.py), every task is also saved to SQLite
+  when it is created, starts and finishes. Tasks dropped from memory are
+  then still found (without their "output": read their log), history pages
+  go back past the memory limit, and tasks survive a restart.
+- Tasks a previous server process left "pending"/"running" are marked
+  "failed" when the server starts (see recover_interrupted()): nothing is
+  running them any more. This is not done on import, as any process
+  importing this module (a shell, a script) would otherwise fail the
+  tasks the live server is running.
+
 THREAD SAFETY:
-- self.lock (threading.Lock) protects access to self.tasks dictionary
-- Prevents race conditions when multiple requests access task data simultaneously
+- self.lock (threading.Lock) protects the self.tasks dictionary itself:
+  adding, removing and walking through tasks. It is held only for that:
+  copying and JSON-encoding the tasks found happens after releasing it,
+  so a long task list or a big output never holds up other requests
+- Each task has its own lock, task["_lock"], protecting that task's fields.
+  A running task only ever takes its own lock, so tasks running side by
+  side never wait for each other on every line of output
+- Lock order: self.lock, then a task's "_lock", then the store's lock,
+  never the other way round. (self._version_lock and self._json_lock are
+  only ever taken last.)
+- Keys starting with "_" are internal: copies handed out (get_task() etc.)
+  leave them out, so they are plain JSON-serializable dicts
+
+CHANGE TRACKING:
+- self.version is a counter bumped every time any task changes (including
+  new log output); each task's "version" records when it last changed
+- The API builds ETags from these so unchanged polls get "304 Not Modified"
 ==============================================================================
 """
 
 import subprocess  # For running external Python scripts
 import threading   # For running tasks in background threads
-import json        # For JSON serialization (optional)
-import uuid        # For generating unique task IDs
+import select      # Waiting for script output with a timeout
+import sys         # sys.executable: the Python interpreter running us
+import time        # Timing output batches
+import orjson      # Fast JSON encoding of task rows for the API
+import secrets     # For generating unique task IDs
 import os          # For file operations
+import gzip        # Compressing logs for HTTP responses
+import hashlib     # Naming the bytecode cache file of each script
+import py_compile  # Precompiling scripts (see PRECOMPILE_SCRIPTS)
+import zlib        # Incremental gzip compression of logs as they are written
+from collections import OrderedDict  # Tasks kept in creation order
 from datetime import datetime  # For timestamps
 from pathlib import Path       # For file path operations
-from typing import Dict, Optional, Callable  # For type hints
+from concurrent.futures import ThreadPoolExecutor  # Bounded pool of task threads
+from typing import Dict, Optional, Callable, Tuple  # For type hints
+from config import MAX_TASKS_IN_MEMORY  # Cap on tasks kept in memory
+from config import EXEC_WORKERS, EXEC_QUEUE_MAX  # Worker pool size and queue limit
+from config import MAX_OUTPUT_IN_MEMORY  # Cap on each task's in-memory output
+from config import MAX_LOG_SIZE  # Largest log kept compressed in memory
+from config import TASKS_DB  # SQLite file keeping task history
+from config import PRECOMPILE_SCRIPTS  # Run scripts from cached bytecode
+from task_store import TaskStore  # Saves tasks so they outlive memory and restarts
+
+
+# Script output is handled in batches rather than line by line: whatever
+# arrives within OUTPUT_FLUSH_INTERVAL seconds (up to OUTPUT_FLUSH_BYTES) is
+# written, counted and published together, with one lock and one callback.
+# Output arriving after a quiet spell is still published at once.
+OUTPUT_FLUSH_INTERVAL = 0.05  # seconds
+OUTPUT_FLUSH_BYTES = 64 * 1024
+OUTPUT_READ_SIZE = 64 * 1024  # Most bytes taken from the pipe per read
+
+# When a script fails, the last lines of its output become the task's
+# "error" (with stderr merged into stdout, that's where its traceback is)
+ERROR_TAIL_LINES = 20
+ERROR_TAIL_BYTES = 4096  # Most output kept back for this while running
+
+# select() can wait on pipes everywhere except Windows. There, every read is
+# published straight away (a read still returns all output waiting in the
+# pipe, so busy scripts are batched anyway).
+_CAN_SELECT_PIPES = os.name != "nt"
+
+
+# Statuses a task never leaves once reached. Streaming/polling clients use this
+# to know when no more output can appear for a task.
+TERMINAL_STATUSES = ("success", "failed")
 
 
 class TaskExecutor:
@@ -43,45 +123,183 @@ class TaskExecutor:
     
     ATTRIBUTES:
         logs_dir (str): Directory where execution logs are stored
-        tasks (Dict[str, dict]): In-memory storage of all tasks
+        tasks (OrderedDict[str, dict]): In-memory storage of tasks, oldest first
+        max_tasks (int): How many tasks to keep before forgetting finished ones
         lock (threading.Lock): Ensures thread-safe access to tasks dictionary
+        version (int): Increases every time any task changes
+        pool (ThreadPoolExecutor): Worker threads that run the tasks
+        max_queued (int): How many tasks may wait for a worker
+        store (TaskStore): Where tasks are saved, or None to keep them in
+                           memory only
+        precompile (bool): Run scripts from cached bytecode
     
     EXAMPLE USAGE:
         executor = TaskExecutor(logs_dir="logs")
-        task_id = executor.create_task("John", "script.py", [])
+        task_id, task = executor.create_task("John", "script.py", [])
         executor.execute_task(task_id)
         task_status = executor.get_task(task_id)
     """
     
-    def __init__(self, logs_dir: str = "logs"):
+    def __init__(self, logs_dir: str = "logs", max_tasks: int = MAX_TASKS_IN_MEMORY,
+                 max_workers: int = EXEC_WORKERS, max_queued: int = EXEC_QUEUE_MAX,
+                 store: Optional[TaskStore] = None,
+                 precompile: bool = PRECOMPILE_SCRIPTS):
         """
         Initialize the TaskExecutor.
         
         PARAMETERS:
             logs_dir (str): Path to directory for storing log files.
                            Directory is created if it doesn't exist.
+            max_tasks (int): Maximum number of tasks kept in memory.
+                            The oldest finished tasks are dropped beyond this.
+            max_workers (int): Maximum number of scripts running at once.
+            max_queued (int): Maximum number of tasks waiting for a worker
+                             (see queue_full()).
+            store (TaskStore, optional): Save tasks here as well. (Call
+                                        recover_interrupted() when the
+                                        server starts.)
+            precompile (bool): Compile each script to bytecode once (again
+                              after it changes) and run that, instead of
+                              having Python compile it on every run. See
+                              PRECOMPILE_SCRIPTS in config.py for the
+                              catch.
         
         EXAMPLE:
             executor = TaskExecutor(logs_dir="./execution_logs")
+            executor = TaskExecutor(store=TaskStore("logs/tasks.db"))
         """
         self.logs_dir = logs_dir
+        self.max_tasks = max_tasks
+        self.max_queued = max_queued
+        self.store = store
+        self.precompile = precompile
         
         # Create logs directory if it doesn't exist
         # exist_ok=True prevents error if directory already exists
         Path(logs_dir).mkdir(exist_ok=True)
         
+        # Log file paths are this prefix + task ID + ".log". Joining it once
+        # here (ends in the platform's separator, e.g. "logs/") leaves
+        # create_task() a plain string concatenation.
+        self._logs_prefix = os.path.join(logs_dir, "")
+        
+        # Bytecode of precompiled scripts:
+        # script_path -> (script mtime_ns, path of its .pyc)
+        self._bytecode_dir = os.path.join(logs_dir, ".bytecode")
+        self._compiled: Dict[str, Tuple[int, str]] = {}
+        if precompile:
+            Path(self._bytecode_dir).mkdir(exist_ok=True)
+        
         # Dictionary to store all task states in memory
-        # Key: unique task ID (UUID string)
+        # Key: unique task ID (32 random hex digits)
         # Value: dictionary containing task details (status, progress, logs, etc.)
-        self.tasks: Dict[str, dict] = {}
+        # OrderedDict keeps creation order: oldest first, newest last
+        self.tasks: "OrderedDict[str, dict]" = OrderedDict()
         
         # Threading lock to prevent race conditions
-        # When multiple threads access self.tasks, this lock ensures only one
-        # thread can modify it at a time, preventing data corruption
+        # When multiple threads add, remove or list tasks, this lock ensures
+        # only one thread can change self.tasks at a time, preventing data
+        # corruption. (Changes to a single task use that task's "_lock".)
         self.lock = threading.Lock()
+        
+        # Change counter: bumped on every task mutation (see _touch())
+        # Lets callers detect "nothing changed since last time" cheaply
+        # Has its own tiny lock, as tasks holding only their own lock bump it
+        # (With a store, tasks outlive the process: start from the clock, so
+        # the task list never gets a version it had before a restart.)
+        self.version = time.time_ns() // 1000 if store is not None else 0
+        self._version_lock = threading.Lock()
+        
+        # Cache of each task encoded as JSON: task_id -> (version, bytes)
+        # A task is only re-encoded after it changes (its version moves on),
+        # not on every poll of the task list
+        # Has its own lock, so encoding can happen without self.lock held
+        self._json_cache: Dict[str, Tuple[int, bytes]] = {}
+        self._json_lock = threading.Lock()
+        
+        # Gzip-compressed copy of each started task's log: task_id -> _GzipLog
+        # Kept up to date by the task's own thread as it writes the log, so
+        # serving a compressed log never compresses anything on request
+        self._log_gz: Dict[str, "_GzipLog"] = {}
+        
+        # Compressed logs of finished tasks that have no _GzipLog (evicted
+        # from memory, or from before a restart): task_id -> (gzip_bytes,
+        # size), least recently used first, at most max_tasks of them, and
+        # only logs of up to MAX_LOG_SIZE bytes.
+        # Their logs never change again, so each is compressed only once.
+        self._log_gz_finished: "OrderedDict[str, Tuple[bytes, int]]" = OrderedDict()
+        
+        # Fixed set of worker threads that run the tasks
+        # Threads (not processes) are enough: each script already runs in its
+        # own subprocess, the thread only relays its output. A fixed pool
+        # stops a burst of submissions from starting a burst of threads and
+        # scripts; extra tasks wait in the pool's queue instead.
+        # (threads are named task_0, task_1, ... in thread dumps and logs)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        
+        # Tasks submitted to the pool that no worker has picked up yet
+        self._queued = 0
+        
+        # Set by shutdown(): tasks still waiting in the queue don't start
+        self._closing = False
+    
+    
+    def _touch(self, task: dict) -> None:
+        """
+        Record that a task just changed.
+        
+        Bumps the executor-wide version and stamps it on the task, so both
+        "has anything changed?" and "has this task changed?" can be answered
+        by comparing numbers. Must be called with the task's "_lock" held,
+        after every mutation of a task (status, progress, output or log file).
+        """
+        with self._version_lock:
+            self.version += 1
+            task["version"] = self.version
+    
+    def _persist(self, task: dict) -> None:
+        """
+        Save a task's new status to the store, if there is one.
+        
+        Called with the task's "_lock" held, right after a status change
+        (running, success, failed), so the saved copy is up to date before
+        the task can be evicted from memory. Progress and output changes are
+        not saved: see task_store.py.
+        """
+        if self.store is not None:
+            self.store.update(task)
     
     
-    def create_task(self, user_name: str, script_path: str, args: list = None) -> str:
+    def _evict_finished_tasks(self) -> None:
+        """
+        Forget the oldest finished tasks until at most max_tasks remain.
+        
+        Only tasks in TERMINAL_STATUSES are removed: a running task's
+        background thread still needs its entry. If every task is still
+        active, the limit is temporarily exceeded. Log files stay on disk
+        (and, with a store, the tasks stay there too).
+        Must be called with self.lock held.
+        """
+        excess = len(self.tasks) - self.max_tasks
+        if excess <= 0:
+            return
+        
+        # Oldest first, thanks to the OrderedDict's creation order
+        finished = [
+            task_id for task_id, task in self.tasks.items()
+            if task["status"] in TERMINAL_STATUSES
+        ][:excess]
+        for task_id in finished:
+            del self.tasks[task_id]
+            with self._json_lock:
+                self._json_cache.pop(task_id, None)
+            self._log_gz.pop(task_id, None)
+        if finished:
+            with self._version_lock:
+                self.version += 1  # The task list changed
+    
+    
+    def create_task(self, user_name: str, script_path: str, args: list = None) -> Tuple[str, dict]:
         """
         Create a new task record in the executor.
         
@@ -94,11 +312,14 @@ class TaskExecutor:
             args (list): Command-line arguments to pass to the script
         
         RETURNS:
-            str: Unique task ID (UUID) to reference this task later
+            tuple: (task_id, task)
+                task_id (str): Unique task ID (random hex) to reference this task later
+                task (dict): Copy of the new task, as get_task() would return
+                             it now (saves callers a second lookup)
         
         TASK STRUCTURE (what gets stored):
             {
-                "id": "550e8400-e29b-41d4-a716-446655440000",  # Unique identifier
+                "id": "550e8400e29b41d4a716446655440000",  # Unique identifier
                 "user_name": "John Doe",                        # User reference
                 "script_path": "/path/to/script.py",           # Script location
                 "args": ["arg1", "arg2"],                      # Script arguments
@@ -107,106 +328,209 @@ class TaskExecutor:
                 "created_at": "2024-11-16T10:30:00",          # When created
                 "started_at": None,                            # When execution started
                 "completed_at": None,                          # When finished
-                "output": "",                                  # Script output so far
+                "output": "",                                  # Latest script output (up to 2x MAX_OUTPUT_IN_MEMORY chars)
                 "error": "",                                   # Error message if failed
                 "return_code": None,                           # Exit code (0=success)
-                "log_file": "logs/550e8400-....log"           # Path to log file
+                "log_file": "logs/550e8400....log",          # Path to log file
+                "version": 1                                   # Bumped on every change
             }
         
         EXAMPLE:
-            task_id = executor.create_task(
+            task_id, task = executor.create_task(
                 user_name="Alice",
                 script_path="/app/backend/data_processor.py",
                 args=["--input", "data.csv"]
             )
             print(f"Created task: {task_id}")
-            # Output: Created task: 550e8400-e29b-41d4-a716-446655440000
+            # Output: Created task: 550e8400e29b41d4a716446655440000
         
         THREAD SAFETY:
             Uses self.lock to ensure task dictionary isn't modified by other
             threads while we're adding the new task
+        
+        MEMORY LIMIT:
+            If this takes the executor over max_tasks, the oldest finished
+            tasks are forgotten (see _evict_finished_tasks())
         """
-        # Generate a unique identifier for this task (UUID4 is random and unique)
-        task_id = str(uuid.uuid4())
+        # Generate a unique identifier for this task: 16 random bytes as hex
+        # (as unique as a UUID4, without building a UUID object to format)
+        task_id = secrets.token_hex(16)
+        
+        # Create the task dictionary with all initial values
+        task = {
+            "id": task_id,
+            "user_name": user_name,
+            "script_path": script_path,
+            "args": args or [],  # Use empty list if None provided
+            "status": "pending",  # Initial status before execution starts
+            "progress": 0,  # 0% complete initially
+            "created_at": _now(),  # Record creation time
+            "started_at": None,  # Will be set when execute_task() runs it
+            "completed_at": None,  # Will be set when script finishes
+            "output": "",  # Script output so far (filled in on copies: _public_copy())
+            "_output_chunks": [],  # Output as received, one entry per batch
+            "error": "",  # Will store error message if execution fails
+            "return_code": None,  # Will store Python exit code (0 = success)
+            "log_file": self._logs_prefix + task_id + ".log",
+            "_lock": threading.Lock()  # Guards this task's fields
+        }
+        
+        # Saved before anyone can see it in memory (and so before it runs)
+        if self.store is not None:
+            self.store.insert(task)
         
         # Lock the tasks dictionary to prevent other threads from modifying it
-        # while we're creating our new task
+        # while we're adding our new task
         with self.lock:
-            # Create the task dictionary with all initial values
-            self.tasks[task_id] = {
-                "id": task_id,
-                "user_name": user_name,
-                "script_path": script_path,
-                "args": args or [],  # Use empty list if None provided
-                "status": "pending",  # Initial status before execution starts
-                "progress": 0,  # 0% complete initially
-                "created_at": datetime.now().isoformat(),  # Record creation time
-                "started_at": None,  # Will be set when execute_task() runs it
-                "completed_at": None,  # Will be set when script finishes
-                "output": "",  # Will accumulate script output during execution
-                "error": "",  # Will store error message if execution fails
-                "return_code": None,  # Will store Python exit code (0 = success)
-                "log_file": os.path.join(self.logs_dir, f"{task_id}.log")
-            }
+            self._touch(task)
+            self.tasks[task_id] = task
+            
+            # Stay within the memory limit
+            self._evict_finished_tasks()
         
-        # Return the task ID so caller can reference this task later
-        return task_id
+        # Copy it now: once execute_task() is called, the worker thread
+        # starts changing the original
+        task = _public_copy(task)
+        
+        # Return the task ID so caller can reference this task later,
+        # and the task itself so they don't need to look it up again
+        return task_id, task
     
     
     def execute_task(self, task_id: str, callback: Optional[Callable] = None) -> None:
         """
-        Execute a task in a separate background thread.
+        Queue a task to be executed by a background worker thread.
         
-        This method does NOT wait for the script to finish. Instead, it starts
-        the script in a background thread and immediately returns. This keeps
+        This method does NOT wait for the script to finish. Instead, it hands
+        the task to the worker pool and immediately returns. This keeps
         the API responsive while the script runs.
         
-        WHY THREADING?
+        WHY A THREAD POOL?
         If we ran scripts directly without threads, the API would block and
         become unresponsive while waiting for the script to complete. By using
         threads, multiple scripts can run simultaneously and users can monitor
-        them in real-time via the API.
+        them in real-time via the API. A pool of max_workers threads (rather
+        than one new thread per task) caps how many scripts run at once;
+        the others stay "pending" until a worker is free.
+        
+        WHY NOT ONE ASYNCIO EVENT LOOP FOR ALL TASKS?
+        A worker spends most of its time waiting on its script's pipe, so
+        an event loop could watch every running script from one thread.
+        But between waits each task does blocking work: writing and
+        fsync()ing its log, saving to the task store, calling callbacks
+        that may do anything. On a shared loop any of those would stall the
+        output of every other task. With max_workers threads (a few, not
+        one per task), a slow task only ever holds up itself.
         
         PARAMETERS:
             task_id (str): The ID of the task to execute (from create_task())
-            callback (Callable, optional): Function to call when task state updates
-                                          Signature: callback(task_id, task_dict)
+            callback (Callable, optional): Function to call when the task
+                                          produces output or its status
+                                          changes
+                                          Signature: callback(task_id, update)
+                                          where update is a small dict, see
+                                          _public_view()
         
         EXAMPLE:
-            def on_progress(task_id, task_state):
-                print(f"Task {task_id}: {task_state['progress']}% complete")
+            def on_progress(task_id, update):
+                print(f"Task {task_id}: {update['progress']}% complete")
             
             executor.execute_task(task_id, callback=on_progress)
-            print("Script started in background!")  # Returns immediately
+            print("Script queued in background!")  # Returns immediately
         
-        INTERNALS:
-            - Creates a new Thread object
-            - Sets target to _execute_task_internal() method
-            - Sets daemon=True so thread doesn't prevent app shutdown
-            - Starts the thread
+        NOTE:
+            Callers that want to refuse work when too much is waiting should
+            check queue_full() first; this method always queues the task.
+        
+        RAISES:
+            RuntimeError: If shutdown() has been called
         """
-        # Create a new thread that will run the script
-        # daemon=True means this thread won't prevent the application from exiting
-        thread = threading.Thread(
-            target=self._execute_task_internal,  # The method to run in thread
-            args=(task_id, callback),             # Arguments to pass to method
-            daemon=True                           # Background thread (not blocking)
-        )
+        with self.lock:
+            self._queued += 1
         
-        # Start the thread immediately
-        # From this point, the method returns and script runs in background
-        thread.start()
+        # The pool runs _execute_task_internal() on the next free worker
+        try:
+            self.pool.submit(self._execute_task_internal, task_id, callback)
+        except RuntimeError:
+            # Pool already shut down (see shutdown()): nothing was queued,
+            # and the task will never run
+            with self.lock:
+                self._queued -= 1
+                task = self.tasks.get(task_id)
+            if task is not None:
+                with task["_lock"]:
+                    task["status"] = "failed"
+                    task["error"] = "Cancelled: the server is shutting down"
+                    task["progress"] = 100
+                    task["completed_at"] = _now()
+                    self._touch(task)
+                    self._persist(task)
+            raise
+    
+    def queue_full(self) -> bool:
+        """
+        Check whether max_queued tasks are already waiting for a worker.
+        
+        The API uses this to turn new submissions away (429 Too Many
+        Requests) rather than let the queue, and the wait, grow without end.
+        
+        RETURNS:
+            bool: True if no more tasks should be queued for now
+        """
+        with self.lock:
+            return self._queued >= self.max_queued
+    
+    def recover_interrupted(self) -> int:
+        """
+        Mark tasks a previous server process left unfinished as failed.
+        
+        Call this once, when the server starts and before it accepts
+        requests: tasks the store still lists as "pending" or "running"
+        belonged to a process that stopped, so nothing will finish them.
+        It is deliberately not done in __init__: every process importing
+        this module creates the global executor, and one that isn't the
+        server (a shell, a script) would fail the server's live tasks.
+        
+        RETURNS:
+            int: How many tasks were marked (0 without a store)
+        
+        EXAMPLE:
+            executor.recover_interrupted()  # In app.py, before serving
+        """
+        if self.store is None:
+            return 0
+        return self.store.fail_interrupted(_now())
+    
+    
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        Stop running tasks from the queue, e.g. when the server stops.
+        
+        Tasks already running are left to finish. Tasks still waiting for a
+        worker are marked "failed" instead of being started, and
+        execute_task() can't be called any more.
+        
+        PARAMETERS:
+            wait (bool): Block until the running tasks have finished
+        
+        NOTE:
+            Python waits for the pool's threads before exiting anyway;
+            calling this first means it only waits for scripts that are
+            already running, not for the whole queue.
+        """
+        self._closing = True
+        self.pool.shutdown(wait=wait)
     
     
     def _execute_task_internal(self, task_id: str, callback: Optional[Callable]) -> None:
         """
         INTERNAL method that actually executes the Python script.
         
-        This runs inside the background thread created by execute_task().
+        This runs on a worker thread of self.pool, queued by execute_task().
         It handles the entire execution pipeline:
         1. Update task status to "running"
         2. Start the subprocess
-        3. Stream output line-by-line
+        3. Stream output in small batches (see OUTPUT_FLUSH_INTERVAL)
         4. Save output to log file
         5. Update progress
         6. Handle completion/errors
@@ -216,83 +540,253 @@ class TaskExecutor:
         
         HOW SUBPROCESS WORKS:
         subprocess.Popen() starts a new Python process to run the script.
-        We use pipes (stdout=PIPE, stderr=PIPE) to capture the output so we
-        can read it line-by-line and display it in real-time.
+        We use a pipe (stdout=PIPE) to capture the output so we can read it
+        as it is produced and display it in real-time. stderr is sent into
+        the same pipe (stderr=STDOUT): error messages show up in the log
+        exactly where they happened, and there is no second pipe that could
+        fill up and stall the script while we only read the first one.
+        
+        WHY BATCHES?
+        A chatty script can print thousands of lines a second. Handling each
+        line on its own (lock, log write + flush, callback) costs far more
+        than the line itself. Instead we collect output for up to
+        OUTPUT_FLUSH_INTERVAL and handle it in one go. select() lets us stop
+        waiting when the interval is up, so a batch is never held back by
+        a script that has gone quiet.
         
         PARAMETERS:
             task_id (str): ID of task to execute
-            callback (Callable): Function to notify on progress updates
+            callback (Callable): Function to notify of output and status updates
         
         ERROR HANDLING:
             - Catches exceptions and marks task as "failed"
             - Stores error message in task['error']
             - Still completes the task (doesn't leave it hanging)
         """
+        # Compressed copy of the log, fed alongside the log file below
+        gz_log = _GzipLog(MAX_LOG_SIZE)
+        
+        with self.lock:
+            self._queued -= 1  # Picked up by a worker: no longer waiting
+            # Our own reference: from here on only the task's "_lock" is used
+            # (and once finished, the task may be evicted from self.tasks)
+            task = self.tasks[task_id]
+            if not self._closing:
+                self._log_gz[task_id] = gz_log
+        
+        if self._closing:
+            # Queued before shutdown(): don't start it now
+            with task["_lock"]:
+                task["status"] = "failed"
+                task["error"] = "Cancelled: the server is shutting down"
+                task["progress"] = 100
+                task["completed_at"] = _now()
+                self._touch(task)
+                self._persist(task)
+            return
+        
         try:
             # Update task status to "running" with thread safety
-            with self.lock:
-                task = self.tasks[task_id]
+            with task["_lock"]:
                 task["status"] = "running"
-                task["started_at"] = datetime.now().isoformat()
+                task["started_at"] = _now()
+                self._touch(task)
+                self._persist(task)
             
             # Get the script path and arguments from the task
-            script_path = self.tasks[task_id]["script_path"]
-            args = self.tasks[task_id]["args"]
+            script_path = task["script_path"]
+            args = task["args"]
             
             # Build the command to execute
-            # Example: ["python", "/path/to/script.py", "arg1", "arg2"]
-            cmd = ["python", script_path] + args
+            # Example: ["/usr/bin/python3", "/path/to/script.py", "arg1", "arg2"]
+            # sys.executable is the full path of the interpreter running this
+            # server: no PATH search on every run, and scripts get the same
+            # Python version and installed packages as the dashboard, not
+            # whichever "python" happens to come first on the PATH
+            cmd = [sys.executable, self._script_to_run(script_path)] + args
             
             # Open the log file where we'll write all output
-            with open(self.tasks[task_id]["log_file"], "w") as log_file:
+            # (binary: script output is copied to it exactly as received;
+            # a buffer as big as a full batch, so each batch is written to
+            # the OS in one go, when it's flushed)
+            with open(task["log_file"], "wb", buffering=OUTPUT_FLUSH_BYTES) as log_file:
                 # Start the Python subprocess
                 # Popen() creates a new process but doesn't wait for it to finish
                 # stdout=PIPE: Capture output so we can read it
-                # stderr=PIPE: Capture errors separately
-                # text=True: Return output as strings (not bytes)
-                # bufsize=1: Line buffered (each line is a unit)
+                # stderr=STDOUT: Errors go into the same pipe, in order
+                # bufsize=0: Unbuffered, so a read returns whatever output
+                #            is waiting instead of waiting for more
                 process = subprocess.Popen(
                     cmd,
                     stdout=subprocess.PIPE,  # Capture standard output
-                    stderr=subprocess.PIPE,  # Capture error output
-                    text=True,               # Return strings, not bytes
-                    bufsize=1                # Line-buffered mode
+                    stderr=subprocess.STDOUT,  # Merge errors into stdout
+                    bufsize=0                # Unbuffered pipe (bytes)
                 )
+                stdout = process.stdout
+                # Read the pipe's file descriptor directly with os.read():
+                # one system call per read, no file object layers on top
+                stdout_fd = stdout.fileno()
                 
-                # Read output line by line as script executes
-                # This creates a real-time streaming effect
-                output_lines = []
-                for line in process.stdout:
-                    # Add line to list for accumulation
-                    output_lines.append(line)
+                # Output read since the last flush, and its size
+                pending = []
+                pending_bytes = 0
+                last_flush = time.monotonic()
+                # Bytes of a UTF-8 character split between two batches
+                partial = b""
+                lines = 0
+                # Last ERROR_TAIL_BYTES of output, for the error message
+                tail = b""
+                # Progress as last published (see flush_output())
+                progress = 0
+                # Characters currently held in output_chunks
+                output_size = 0
+                
+                # Look these up once, not on every batch or read
+                # (_public_copy() compacts output_chunks in place, so this
+                # reference to the list stays valid)
+                task_lock = task["_lock"]
+                output_chunks = task["_output_chunks"]
+                write_log = log_file.write
+                flush_log = log_file.flush
+                write_gz = gz_log.write
+                monotonic = time.monotonic
+                
+                def flush_output() -> None:
+                    """Publish the pending batch of output in one go."""
+                    nonlocal pending, pending_bytes, last_flush, partial, lines, tail, progress
+                    nonlocal output_size
+                    data = b"".join(pending)
+                    pending = []
+                    pending_bytes = 0
+                    last_flush = monotonic()
+                    
+                    # Write the whole batch to the log file at once
+                    write_log(data)
+                    flush_log()  # One flush per batch, not per line
+                    
+                    # Compress it now, in this thread, not when it's requested
+                    write_gz(data)
+                    
+                    # Count lines on the raw bytes (a b"\n" byte is always a
+                    # newline in UTF-8, never part of another character)
+                    lines += data.count(b"\n")
+                    tail = (tail + data)[-ERROR_TAIL_BYTES:]
                     
-                    # Write line to log file immediately
-                    log_file.write(line)
-                    log_file.flush()  # Force write to disk immediately
+                    # Decode for the in-memory copy; a character cut in half
+                    # by the batch boundary is finished by the next batch
+                    data = partial + data
+                    cut = len(data) - _incomplete_utf8_tail(data)
+                    text = data[:cut].decode("utf-8", "replace")
+                    partial = data[cut:]
+                    
+                    # Calculate progress (max 95% until process finishes)
+                    # This is because we can't know exact % without end markers
+                    # It stops moving after 19 lines; from then on there is
+                    # no progress to report, only output
+                    new_progress = min(95, lines * 5)
+                    progress_changed = new_progress != progress
+                    progress = new_progress
                     
                     # Update task progress with thread safety
-                    with self.lock:
-                        # Accumulate all output
-                        self.tasks[task_id]["output"] = "".join(output_lines)
+                    # (only this task's lock: other tasks carry on meanwhile)
+                    with task_lock:
+                        # Accumulate all output (joined only when someone
+                        # asks for it: see _public_copy())
+                        output_chunks.append(text)
+                        output_size += len(text)
+                        
+                        # Over twice the limit: drop all but the last
+                        # MAX_OUTPUT_IN_MEMORY characters. (Waiting for
+                        # twice the limit means each character is copied
+                        # here at most once or twice, however long the run.)
+                        if output_size > 2 * MAX_OUTPUT_IN_MEMORY:
+                            kept = _last_chars("".join(output_chunks), MAX_OUTPUT_IN_MEMORY)
+                            output_chunks[:] = [kept]
+                            output_size = len(kept)
+                        
+                        if progress_changed:
+                            task["progress"] = progress
                         
-                        # Calculate progress (max 95% until process finishes)
-                        # This is because we can't know exact % without end markers
-                        self.tasks[task_id]["progress"] = min(95, len(output_lines) * 5)
+                        # Batch was written to the log too, so this covers it
+                        self._touch(task)
                     
-                    # Call the callback to notify about progress
-                    if callback:
-                        callback(task_id, self.tasks[task_id])
+                    # Call the callback with this batch's output (once per
+                    # batch, not per line). Every batch with output is
+                    # passed on, so callbacks together see all of it.
+                    if callback and text:
+                        callback(task_id, self._public_view(task, text))
+                
+                # Read output as the script produces it, until it closes stdout
+                while True:
+                    if _CAN_SELECT_PIPES:
+                        if pending:
+                            # Wait for more output only until this batch is due
+                            wait = last_flush + OUTPUT_FLUSH_INTERVAL - monotonic()
+                            if not select.select([stdout], [], [], max(0, wait))[0]:
+                                flush_output()  # Gone quiet: publish what we have
+                                continue
+                        else:
+                            # Nothing to publish: wait as long as it takes.
+                            # (Waiting here, not in os.read(), matters under
+                            # gevent: its subprocess makes the pipe
+                            # non-blocking, so a read with no output waiting
+                            # fails instead of waiting.)
+                            select.select([stdout], [], [])
+                    
+                    # Only called once select() says there is output, so this
+                    # never holds back a due batch
+                    try:
+                        data = os.read(stdout_fd, OUTPUT_READ_SIZE)
+                    except BlockingIOError:
+                        # Non-blocking pipe (gevent) with nothing in it
+                        # after all: no output yet, wait again
+                        if not _CAN_SELECT_PIPES:
+                            time.sleep(OUTPUT_FLUSH_INTERVAL)
+                        continue
+                    if not data:
+                        break  # End of output: the script closed stdout
+                    pending.append(data)
+                    pending_bytes += len(data)
+                    
+                    if (not _CAN_SELECT_PIPES
+                            or pending_bytes >= OUTPUT_FLUSH_BYTES
+                            or monotonic() - last_flush >= OUTPUT_FLUSH_INTERVAL):
+                        flush_output()
+                
+                # Publish the last batch (and any bytes left undecoded,
+                # handed to the final callback below)
+                if pending:
+                    flush_output()
+                leftover = ""
+                if partial:
+                    leftover = partial.decode("utf-8", "replace")
+                    with task_lock:
+                        output_chunks.append(leftover)
+                        self._touch(task)
                 
                 # Wait for process to complete and get exit code
                 # 0 = success, non-zero = error
                 return_code = process.wait()
                 
-                # Read any remaining error output
-                stderr = process.stderr.read() if process.stderr else ""
+                if return_code != 0:
+                    # Note the failure in the log file too
+                    data = f"\nERROR: script exited with code {return_code}\n".encode("utf-8")
+                    write_log(data)
+                    write_gz(data)
+                
+                # The log is complete: flush it, and have the OS store it on
+                # disk, before the task is seen as finished. (fsync once per
+                # task; while running, a flush per batch is enough for the
+                # log endpoints, which read through the OS cache.)
+                flush_log()
+                os.fsync(log_file.fileno())
+                
+                # Nothing more will be compressed: finish the copy and
+                # free its compressor
+                gz_log.finish()
                 
                 # Update task with final status
-                with self.lock:
-                    task = self.tasks[task_id]
+                with task["_lock"]:
                     task["return_code"] = return_code
                     task["progress"] = 100  # 100% complete
                     
@@ -301,27 +795,114 @@ class TaskExecutor:
                         task["status"] = "success"
                     else:
                         task["status"] = "failed"
-                        task["error"] = stderr
-                        # Also write error to log file
-                        log_file.write(f"\nERROR:\n{stderr}")
+                        # The script's own error output is already in the
+                        # log; its last lines also become the error message
+                        task["error"] = _last_lines(tail, ERROR_TAIL_LINES)
                     
                     # Record completion time
-                    task["completed_at"] = datetime.now().isoformat()
+                    task["completed_at"] = _now()
+                    self._touch(task)
+                    self._persist(task)
                 
                 # Notify about final status
                 if callback:
-                    callback(task_id, self.tasks[task_id])
+                    callback(task_id, self._public_view(task, leftover))
         
         except Exception as e:
             # If anything goes wrong, mark task as failed with error message
-            with self.lock:
-                self.tasks[task_id]["status"] = "failed"
-                self.tasks[task_id]["error"] = str(e)
-                self.tasks[task_id]["progress"] = 100
-                self.tasks[task_id]["completed_at"] = datetime.now().isoformat()
+            with task["_lock"]:
+                task["status"] = "failed"
+                task["error"] = str(e)
+                task["progress"] = 100
+                task["completed_at"] = _now()
+                self._touch(task)
+                self._persist(task)
             
             if callback:
-                callback(task_id, self.tasks[task_id])
+                callback(task_id, self._public_view(task))
+    
+    def _script_to_run(self, script_path: str) -> str:
+        """
+        The file to hand to the interpreter for a script.
+        
+        With precompiling on, that is a .pyc compiled on first use and again
+        whenever the script's modification time changes; otherwise (or if
+        compiling fails) the script itself.
+        
+        PARAMETERS:
+            script_path (str): Path of the script to run
+        
+        RETURNS:
+            str: Path of the .pyc, or script_path
+        
+        EXAMPLE:
+            executor._script_to_run("/app/backend/sample_script.py")
+            # "logs/.bytecode/sample_script-3f2b9c0e6a1d.pyc"
+        
+        NOTE:
+            Python never caches the bytecode of the script it is started
+            with (only of modules it imports), so without this a script
+            run a thousand times is compiled a thousand times.
+            Tracebacks still show the source lines: the bytecode refers to
+            the original file.
+        """
+        if not self.precompile:
+            return script_path
+        
+        try:
+            mtime = os.stat(script_path).st_mtime_ns
+        except OSError:
+            return script_path  # Let Python report the missing script
+        
+        cached = self._compiled.get(script_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        
+        # One file per script path (two workers compiling the same script
+        # at once is harmless: py_compile replaces the file atomically)
+        digest = hashlib.sha1(script_path.encode("utf-8")).hexdigest()[:12]
+        cfile = os.path.join(self._bytecode_dir, f"{Path(script_path).stem}-{digest}.pyc")
+        try:
+            py_compile.compile(script_path, cfile=cfile, doraise=True)
+        except (py_compile.PyCompileError, OSError):
+            # E.g. a syntax error: running the source puts it in the log
+            return script_path
+        
+        self._compiled[script_path] = (mtime, cfile)
+        return cfile
+    
+    def _public_view(self, task: dict, new_output: str = "") -> dict:
+        """
+        Build the small update passed to execute_task() callbacks.
+        
+        Only the fields that change while a task runs, plus the output that
+        came with this update: never the whole output. A callback pushing
+        updates to browsers (e.g. as JSON over a WebSocket) would otherwise
+        send the entire, ever-growing output every time.
+        
+        PARAMETERS:
+            task (dict): The task (only called from its own thread, which is
+                         the only one changing it, so no lock is needed)
+            new_output (str): Output since the previous update. A
+                              callback is made for every batch of output
+                              (see OUTPUT_FLUSH_INTERVAL), so joining
+                              these gives the task's whole output.
+        
+        RETURNS:
+            dict: {"id", "status", "progress", "error", "new_output"}
+        
+        TIP:
+            To send it as JSON, use orjson.dumps(update) (as the API does):
+            it returns bytes ready to write and is several times faster than
+            the json module.
+        """
+        return {
+            "id": task["id"],
+            "status": task["status"],
+            "progress": task["progress"],
+            "error": task["error"],
+            "new_output": new_output,
+        }
     
     
     def get_task(self, task_id: str) -> Optional[dict]:
@@ -332,28 +913,233 @@ class TaskExecutor:
             task_id (str): ID of task to retrieve
         
         RETURNS:
-            dict: Task object with all current values, or None if task doesn't exist
+            dict: Copy of the task object with all current values,
+                  or None if task doesn't exist
         
         EXAMPLE:
-            task = executor.get_task("550e8400-e29b-41d4-a716-446655440000")
+            task = executor.get_task("550e8400e29b41d4a716446655440000")
             if task:
                 print(f"Status: {task['status']}, Progress: {task['progress']}%")
             else:
                 print("Task not found")
         
         THREAD SAFETY:
-            Uses self.lock to ensure we get a consistent snapshot of task state
+            Uses the task's own lock to ensure we get a consistent snapshot
+            of task state. Finding the task needs no lock: a single dict
+            lookup is atomic in Python.
+        
+        NOTE:
+            With a store, tasks no longer in memory are read from it instead
+            (their "output" is empty: see get_task_logs())
+        """
+        # Return a copy of the task if it exists, otherwise return None.
+        # A copy keeps the snapshot consistent: the background thread
+        # can't change it while the caller is still reading it.
+        return self._lookup(task_id)
+    
+    def _lookup(self, task_id: str) -> Optional[dict]:
         """
+        Copy of a task from memory, else from the store, else None.
+        """
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return self._snapshot(task)
+        if self.store is not None:
+            # Finished and evicted (or from before a restart)
+            return self.store.get(task_id)
+        return None
+    
+    def _snapshot(self, task: dict) -> dict:
+        """
+        Copy a task (without its internal "_" keys) under the task's lock.
+        """
+        with task["_lock"]:
+            return _public_copy(task)
+    
+    def get_tasks_page(self, limit: int, before: Optional[str] = None) -> list:
+        """
+        Retrieve one page of tasks, newest first.
+        
+        PARAMETERS:
+            limit (int): Maximum number of tasks to return
+            before (str, optional): Task ID to continue after. Only tasks
+                                   created before it are returned. Omit for
+                                   the first (newest) page.
+        
+        RETURNS:
+            list: Up to limit task dictionaries, newest first. Empty if
+                  "before" is not a known task.
+        
+        EXAMPLE:
+            page = executor.get_tasks_page(50)
+            older = executor.get_tasks_page(50, before=page[-1]["id"])
+        
+        NOTE:
+            With a store, pages come from it, so they go back past the tasks
+            kept in memory. Tasks that are in memory are taken from there
+            (they may have changed since they were last saved).
+        """
+        if self.store is not None:
+            # Order from the store, content from memory where possible
+            # (one query for the page, then plain dict lookups; stored-only
+            # tasks are finished, so the stored copy is up to date)
+            rows = []
+            for stored in self.store.page(limit, before):
+                task = self.tasks.get(stored["id"])
+                rows.append(self._snapshot(task) if task is not None else stored)
+            return rows
+        
+        with self.lock:
+            page = self._page(limit, before)
+        return [self._snapshot(task) for task in page]
+    
+    def get_tasks_page_json(self, limit: int, before: Optional[str] = None) -> list:
+        """
+        Same as get_tasks_page(), but each task comes already encoded as JSON.
+        
+        Encodings are cached per task and reused until the task changes, so
+        polling an unchanged task list costs no JSON encoding at all. The API
+        joins these into its response body directly.
+        
+        RETURNS:
+            list: Up to limit JSON-encoded tasks (bytes), newest first
+        
+        EXAMPLE:
+            rows = executor.get_tasks_page_json(50)
+            body = b"[" + b",".join(rows) + b"]"
+        """
+        if self.store is not None:
+            # Order from the store, content from memory where possible
+            # (stored-only tasks are finished: encoded as they are)
+            # (a dict lookup is atomic: no need for self.lock)
+            rows = []
+            for stored in self.store.page(limit, before):
+                task = self.tasks.get(stored["id"])
+                rows.append(self._encoded(task) if task is not None else orjson.dumps(stored))
+            return rows
+        
+        # Only the walk through self.tasks needs self.lock, not the encoding
         with self.lock:
-            # Return the task if it exists, otherwise return None
-            return self.tasks.get(task_id)
+            page = self._page(limit, before)
+        return [self._encoded(task) for task in page]
+    
+    def get_tasks_json_by_id(self, task_ids: list) -> Dict[str, bytes]:
+        """
+        Look up several tasks by ID, each already encoded as JSON.
+        
+        Each ID is a direct dictionary lookup, so the cost depends on how
+        many IDs are asked for, not on how many tasks exist. Encodings come
+        from the same cache as get_tasks_page_json().
+        
+        PARAMETERS:
+            task_ids (list): IDs of the tasks wanted
+        
+        RETURNS:
+            dict: task_id -> JSON-encoded task (bytes). IDs that don't
+                  exist are left out.
+        
+        EXAMPLE:
+            rows = executor.get_tasks_json_by_id(["550e8400...", "nope"])
+            # {"550e8400...": b'{"id":"550e8400...",...}'}
+        """
+        rows = {}
+        missing = []
+        # No self.lock: each lookup is a single (atomic) dict access
+        for task_id in task_ids:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                rows[task_id] = self._encoded(task)
+            else:
+                missing.append(task_id)
+        
+        # Not in memory: one query for all of them
+        if missing and self.store is not None:
+            for task_id, task in self.store.get_many(missing).items():
+                rows[task_id] = orjson.dumps(task)
+        return rows
+    
+    def get_task_json(self, task_id: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Look up one task, already encoded as JSON, with its version.
+        
+        The encoding comes from the same cache as get_tasks_page_json(), so
+        polling an unchanged task costs no JSON encoding, and it is dropped
+        with the task when the task leaves memory.
+        
+        RETURNS:
+            tuple: (version, JSON bytes) of the task; the version is the
+                   one the bytes were encoded at. None if there is no such
+                   task.
+        
+        EXAMPLE:
+            found = executor.get_task_json(task_id)
+            if found:
+                version, row = found
+        """
+        task = self.tasks.get(task_id)  # Atomic dict lookup: no self.lock
+        if task is not None:
+            return self._encoded_entry(task)
+        if self.store is not None:
+            # Stored-only tasks are finished: encoded as they are
+            stored = self.store.get(task_id)
+            if stored is not None:
+                return stored["version"], orjson.dumps(stored)
+        return None
+    
+    def _encoded(self, task: dict) -> bytes:
+        """
+        Return a task encoded as JSON, re-encoding it only if it changed
+        since it was last encoded. Call it WITHOUT self.lock held: encoding a
+        task with a lot of output takes a while, and only needs the task's
+        own lock.
+        """
+        return self._encoded_entry(task)[1]
+    
+    def _encoded_entry(self, task: dict) -> Tuple[int, bytes]:
+        """
+        Same as _encoded(), but returns (version, bytes): the version the
+        bytes were encoded at, which may be older than task["version"] by
+        the time the caller looks.
+        """
+        task_id = task["id"]
+        cached = self._json_cache.get(task_id)
+        if cached is None or cached[0] != task["version"]:
+            # New or changed since last encoded: encode it again
+            with task["_lock"]:
+                cached = (task["version"], orjson.dumps(_public_copy(task)))
+            with self._json_lock:
+                # Unless it was evicted meanwhile: nothing would ever
+                # remove its cache entry again
+                if self.tasks.get(task_id) is task:
+                    self._json_cache[task_id] = cached
+        return cached
+    
+    def _page(self, limit: int, before: Optional[str]) -> list:
+        """
+        Collect one page of tasks, newest first (see get_tasks_page()).
+        Must be called with self.lock held.
+        """
+        page = []
+        newest_first = reversed(self.tasks.values())
+        if before is not None:
+            # Skip tasks up to and including the "before" task
+            for task in newest_first:
+                if task["id"] == before:
+                    break
+            else:
+                return []
+        for task in newest_first:
+            if len(page) >= limit:
+                break
+            page.append(task)
+        return page
     
     def get_all_tasks(self) -> list:
         """
         Retrieve all tasks currently in the system.
         
         RETURNS:
-            list: List of all task dictionaries
+            list: Copies of all task dictionaries
         
         USE CASE:
             Called by the API to populate the task history table in the dashboard
@@ -364,12 +1150,19 @@ class TaskExecutor:
                 print(f"{task['user_name']}: {task['status']}")
         
         THREAD SAFETY:
-            Uses self.lock to ensure we get all tasks without race conditions
+            Uses self.lock only while listing the tasks, then copies each
+            one under its own lock, so running tasks are held up at most
+            for the copy of their own entry
+        
+        NOTE:
+            Only the tasks kept in memory (see max_tasks). For the full
+            history, page through get_tasks_page().
         """
         with self.lock:
-            # Convert dictionary values to list and return
+            # Convert dictionary values to list
             # This creates a snapshot of all tasks at this moment
-            return list(self.tasks.values())
+            tasks = list(self.tasks.values())
+        return [self._snapshot(task) for task in tasks]
     
     def get_task_logs(self, task_id: str) -> str:
         """
@@ -400,16 +1193,399 @@ class TaskExecutor:
             the same file simultaneously.
         """
         # Get the log file path from the task
-        log_file = self.tasks[task_id]["log_file"]
+        task = self._lookup(task_id)
+        if task is None:
+            return ""
         
-        # Check if log file exists
-        if os.path.exists(log_file):
-            # Open and read the entire file
-            with open(log_file, "r") as f:
-                return f.read()
+        # The whole log is simply the slice starting at offset 0
+        return _read_log_slice(task["log_file"], 0)[0]
+    
+    def get_task_logs_slice(self, task_id: str, offset: int = 0) -> Tuple[str, int]:
+        """
+        Retrieve only the log output written after a given byte offset.
+        
+        Clients that already have the first part of the log pass the offset
+        they were given last time and receive just the new output, instead of
+        downloading the whole log again on every poll.
         
-        # Return empty string if file doesn't exist yet
-        return ""
+        PARAMETERS:
+            task_id (str): ID of task whose logs to retrieve
+            offset (int): Byte position in the log file to start reading from.
+                          0 returns the complete log.
+        
+        RETURNS:
+            tuple: (new_logs, next_offset)
+                new_logs (str): Log text written since offset ("" if none)
+                next_offset (int): Offset to pass on the next call
+        
+        EXAMPLE:
+            logs, offset = executor.get_task_logs_slice(task_id)
+            # ... later ...
+            new_logs, offset = executor.get_task_logs_slice(task_id, offset)
+        
+        NOTE:
+            The file is opened in binary mode and we seek() straight to the
+            offset, so earlier output is never read into memory. If the read
+            ends in the middle of a multi-byte UTF-8 character, those bytes
+            are left for the next call so the character is never split.
+        """
+        task = self._lookup(task_id)
+        if task is None:
+            # Finished task that was forgotten (see _evict_finished_tasks())
+            return "", max(0, offset)
+        return _read_log_slice(task["log_file"], offset)
+    
+    def get_task_with_logs(self, task_id: str, offset: int = 0) -> Tuple[Optional[dict], Optional[str], int]:
+        """
+        Retrieve a task and its new log output in a single call.
+        
+        Equivalent to get_task() followed by get_task_logs_slice(), but the
+        task is looked up (and the lock taken) only once. Pollers such as
+        the logs endpoint and the log stream call this on every tick.
+        
+        PARAMETERS:
+            task_id (str): ID of task to retrieve
+            offset (int): Byte position in the log file to start reading from
+        
+        RETURNS:
+            tuple: (task, new_logs, next_offset)
+                task (dict): Copy of the task, or None if it doesn't exist
+                new_logs (str): Log text written since offset (None if no task)
+                next_offset (int): Offset to pass on the next call
+        
+        EXAMPLE:
+            task, logs, offset = executor.get_task_with_logs(task_id, offset)
+            if task is None:
+                print("Task not found")
+        
+        ORDERING:
+            The task snapshot is taken BEFORE the log is read. So if the
+            snapshot says the task finished, the logs returned are complete.
+            The file is read after releasing the lock, so running tasks are
+            never blocked on our disk read.
+        
+        TIP:
+            To skip the read when the client is already up to date (e.g. an
+            ETag match), call get_task() first and read_task_log() only if
+            needed: the same two steps, with a check in between.
+        """
+        task = self._lookup(task_id)
+        if task is None:
+            return None, None, offset
+        
+        logs, next_offset = self.read_task_log(task, offset)
+        return task, logs, next_offset
+    
+    def read_task_log(self, task: dict, offset: int = 0) -> Tuple[str, int]:
+        """
+        Read the log of a task already looked up, from a byte offset.
+        
+        Second half of get_task_with_logs(), for callers that decide
+        whether to read at all based on the task (see its ORDERING note:
+        pass a task from get_task() taken before this call).
+        
+        PARAMETERS:
+            task (dict): The task, as returned by get_task()
+            offset (int): Byte position in the log file to start reading from
+        
+        RETURNS:
+            tuple: (new_logs, next_offset)
+        
+        EXAMPLE:
+            task = executor.get_task(task_id)
+            if etag_of(task) != client_etag:
+                logs, offset = executor.read_task_log(task, offset)
+        """
+        return _read_log_slice(task["log_file"], offset)
+    
+    def get_task_log_bytes(self, task_id: str, offset: int = 0) -> Tuple[Optional[dict], Optional[bytes], int]:
+        """
+        Like get_task_with_logs(), but returns the log as raw bytes.
+        
+        Used to serve logs as plain text, without decoding them here only
+        for the web layer to encode them again.
+        
+        RETURNS:
+            tuple: (task, log_bytes, next_offset); (None, None, offset) if
+                   the task doesn't exist
+        """
+        task = self._lookup(task_id)
+        if task is None:
+            return None, None, offset
+        
+        data, next_offset = self.read_task_log_bytes(task, offset)
+        return task, data, next_offset
+    
+    def read_task_log_bytes(self, task: dict, offset: int = 0) -> Tuple[bytes, int]:
+        """
+        Like read_task_log(), but returns the log as raw bytes.
+        
+        RETURNS:
+            tuple: (log_bytes, next_offset)
+        """
+        return _read_log_bytes(task["log_file"], offset)
+    
+    def get_task_log_gzip(self, task_id: str) -> Tuple[Optional[dict], Optional[bytes], int]:
+        """
+        Retrieve a task's complete log, gzip-compressed.
+        
+        Logs are repetitive text and typically shrink 5-10x. The compression
+        itself is done by the task's own thread, a line at a time as the log
+        is written (see _GzipLog), so a request only has to copy out the
+        bytes compressed so far. compresslevel=1 is used: nearly as small,
+        and much faster.
+        
+        RETURNS:
+            tuple: (task, gzip_bytes, size)
+                size (int): Uncompressed log size, i.e. the offset to read
+                            from next time. (None, None, 0) if the task
+                            doesn't exist
+        """
+        task = self._lookup(task_id)
+        if task is None:
+            return None, None, 0
+        return (task,) + self.read_task_log_gzip(task)
+    
+    def read_task_log_gzip(self, task: dict) -> Tuple[bytes, int]:
+        """
+        Compressed complete log of a task already looked up (see
+        read_task_log() for why the two steps are separate).
+        
+        RETURNS:
+            tuple: (gzip_bytes, size), as for get_task_log_gzip()
+        
+        EXAMPLE:
+            task = executor.get_task(task_id)
+            if etag_of(task) != client_etag:
+                body, size = executor.read_task_log_gzip(task)
+        """
+        task_id = task["id"]
+        gz_log = self._log_gz.get(task_id)
+        if gz_log is not None:
+            snapshot = gz_log.snapshot()
+            if snapshot is not None:
+                return snapshot
+            # Else the log outgrew MAX_LOG_SIZE: compressed on request below
+        
+        finished = task["status"] in TERMINAL_STATUSES
+        if finished:
+            with self.lock:
+                cached = self._log_gz_finished.get(task_id)
+                if cached is not None:
+                    self._log_gz_finished.move_to_end(task_id)
+                    return cached
+        
+        # Task hasn't started yet, so there is (almost) nothing to compress;
+        # or it's finished and only in the store: compress it this once;
+        # or its log is too big to keep compressed in memory
+        data, size = _read_log_bytes(task["log_file"], 0)
+        result = (gzip.compress(data, compresslevel=1), size)
+        
+        if finished and size <= MAX_LOG_SIZE:
+            with self.lock:
+                self._log_gz_finished[task_id] = result
+                self._log_gz_finished.move_to_end(task_id)
+                if len(self._log_gz_finished) > self.max_tasks:
+                    self._log_gz_finished.popitem(last=False)
+        return result
+
+
+def _now() -> str:
+    """
+    Current local time as an ISO 8601 string, for task timestamps
+    (created_at, started_at, completed_at).
+    
+    EXAMPLE:
+        _now()   # "2024-11-16T10:30:00.123456"
+    """
+    return datetime.now().isoformat()
+
+
+def _last_chars(text: str, limit: int) -> str:
+    """
+    Return the end of text: at most limit characters, starting at the
+    beginning of a line where possible.
+    
+    EXAMPLE:
+        _last_chars("one\ntwo\nthree\n", 8)   # "three\n"
+    """
+    if len(text) <= limit:
+        return text
+    start = len(text) - limit
+    newline = text.find("\n", start - 1)
+    if newline != -1 and newline + 1 < len(text):
+        start = newline + 1
+    return text[start:]
+
+
+def _last_lines(data: bytes, count: int) -> str:
+    """
+    Decode the end of some output and return its last count lines.
+    
+    data may start in the middle of a line (it is the end of a longer
+    output), in which case that first, partial line is skipped, unless
+    it's all there is.
+    """
+    text = data.decode("utf-8", "replace")
+    lines = text.splitlines(keepends=True)
+    if len(data) >= ERROR_TAIL_BYTES and len(lines) > 1:
+        lines = lines[1:]
+    return "".join(lines[-count:])
+
+
+def _public_copy(task: dict) -> dict:
+    """
+    Shallow copy of a task without its internal keys (those starting with
+    "_", such as the task's lock), ready to hand out or encode as JSON.
+    Must be called with the task's "_lock" held.
+    
+    OUTPUT:
+    The running task only appends each batch of output to
+    task["_output_chunks"]; joining everything into one string after every
+    batch would copy the whole output again each time (O(n^2) in total).
+    Instead the string is built here, when a copy is actually wanted. The
+    joined string then replaces the chunks, so the next copy only joins
+    what arrived since.
+    """
+    copy = {key: value for key, value in task.items() if key[0] != "_"}
+    chunks = task["_output_chunks"]
+    if len(chunks) > 1:
+        chunks[:] = ["".join(chunks)]
+    copy["output"] = chunks[0] if chunks else ""
+    return copy
+
+
+class _GzipLog:
+    """
+    A gzip-compressed copy of a log, built up as the log is written.
+    
+    Each write() compresses only the new bytes, so the whole log is
+    compressed exactly once, by the thread writing it, however often it is
+    downloaded. snapshot() turns what has been compressed so far into a
+    complete .gz file by finishing a COPY of the compressor, which leaves
+    the original free to carry on with the next write.
+    
+    MEMORY:
+        The copy lives in memory for as long as its task does, so it is
+        only kept while the log is at most limit bytes. Once more than that
+        is written, it is dropped and snapshot() returns None: callers then
+        compress the log file when it is requested. finish() frees the
+        compressor itself (about 256 KB) when the log is complete.
+    
+    THREAD SAFETY:
+        One thread writes, any number of threads take snapshots; a small
+        lock keeps the compressed bytes and the size in step.
+    """
+    
+    def __init__(self, limit: int):
+        # wbits=31: produce gzip format (header + trailer), not raw zlib
+        self._compressor = zlib.compressobj(1, zlib.DEFLATED, 31)
+        self._chunks = []   # Compressed output so far
+        self._size = 0      # Uncompressed bytes written so far
+        self._limit = limit
+        self._dropped = False  # Log outgrew limit: no copy any more
+        self._lock = threading.Lock()
+    
+    def write(self, data: bytes) -> None:
+        """Compress data and add it to the copy."""
+        with self._lock:
+            if self._dropped or self._compressor is None:
+                return
+            if self._size + len(data) > self._limit:
+                # Too big to keep in memory: give the copy up for good
+                self._dropped = True
+                self._compressor = None
+                self._chunks = []
+                return
+            self._chunks.append(self._compressor.compress(data))
+            self._size += len(data)
+    
+    def finish(self) -> None:
+        """The log is complete: end the gzip stream, free the compressor."""
+        with self._lock:
+            if self._compressor is not None:
+                self._chunks = [b"".join(self._chunks) + self._compressor.flush()]
+                self._compressor = None
+    
+    def snapshot(self) -> Optional[Tuple[bytes, int]]:
+        """
+        RETURNS:
+            tuple: (gzip_bytes, size) for everything written so far, or
+                   None if the log outgrew the limit
+        """
+        with self._lock:
+            if self._dropped:
+                return None
+            if self._compressor is None:
+                return self._chunks[0], self._size  # Finished
+            tail = self._compressor.copy().flush()
+            return b"".join(self._chunks) + tail, self._size
+
+
+def _read_log_bytes(log_file: str, offset: int) -> Tuple[bytes, int]:
+    """
+    Read a log file from a byte offset to its current end, as raw bytes.
+    
+    See TaskExecutor.get_task_logs_slice() for the details.
+    
+    RETURNS:
+        tuple: (bytes read, offset after them)
+    """
+    offset = max(0, offset)
+    try:
+        # Pollers (above all the log stream, several times a second) mostly
+        # find nothing new: one stat() answers that without opening the file
+        if os.stat(log_file).st_size <= offset:
+            return b"", offset
+        with open(log_file, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        # Log file doesn't exist yet (task hasn't started)
+        return b"", offset
+    
+    # Leave a half-written character for the next read
+    data = data[:len(data) - _incomplete_utf8_tail(data)]
+    return data, offset + len(data)
+
+
+def _read_log_slice(log_file: str, offset: int) -> Tuple[str, int]:
+    """
+    Read a log file from a byte offset to its current end, as text.
+    
+    RETURNS:
+        tuple: (text read, offset after the text)
+    """
+    data, next_offset = _read_log_bytes(log_file, offset)
+    return data.decode("utf-8", "replace"), next_offset
+
+
+def _incomplete_utf8_tail(data: bytes) -> int:
+    """
+    Count the bytes at the end of data that form an unfinished UTF-8 character.
+    
+    A character being written while we read may only be partly on disk.
+    Returns how many trailing bytes belong to it (0 if the data ends cleanly).
+    
+    EXAMPLE:
+        _incomplete_utf8_tail("abc".encode())        # 0
+        _incomplete_utf8_tail("✓".encode()[:2])      # 2 (needs 3 bytes)
+    """
+    # A UTF-8 character is at most 4 bytes, so only look at the last 3
+    for back in range(1, min(3, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 != 0x80:
+            # Found the first byte of the last character: work out its length
+            if byte >= 0xF0:
+                needed = 4
+            elif byte >= 0xE0:
+                needed = 3
+            elif byte >= 0xC0:
+                needed = 2
+            else:
+                needed = 1
+            return back if needed > back else 0
+    return 0
 
 
 # ============================================================================
@@ -417,4 +1593,5 @@ class TaskExecutor:
 # ============================================================================
 # Create a global TaskExecutor instance used by the Flask app
 # This ensures all tasks from all requests use the same executor
-executor = TaskExecutor()
+# Tasks are saved to TASKS_DB, so history survives restarts
+executor = TaskExecutor(store=TaskStore(TASKS_DB))
@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for Python Executor Dashboard
+
+Gunicorn loads this file automatically when started from the backend
+directory:
+    cd backend
+    gunicorn app:app
+
+Every setting can be overridden with an environment variable.
+"""
+
+import os
+
+# Address to listen on
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000')}"
+
+# Worker processes
+# Tasks are kept in the server process's memory, so more than one worker
+# would split them between processes. Raise THREADS/GEVENT_POOL instead.
+workers = int(os.getenv("WORKERS", 1))
+
+# Worker type: "gthread" (thread pool) or "gevent" (greenlets, needs gevent)
+worker_class = os.getenv("WORKER_CLASS", "gthread")
+
+# Threads per worker for "gthread"
+# Every open log stream holds a thread, so this is well above the default of 1
+threads = int(os.getenv("THREADS", 64))
+
+# Simultaneous connections per worker for "gevent"
+worker_connections = int(os.getenv("GEVENT_POOL", 1000))
+
+
+def post_worker_init(worker):
+    """
+    Runs in the worker once it has loaded the app, before it serves.
+
+    Tasks the previous worker (or server) left pending or running are
+    marked failed: app.py's own startup code only runs for `python app.py`.
+    """
+    from executor import executor
+    executor.recover_interrupted()
@@ -17,7 +17,7 @@ FEATURES:
 HOW IT WORKS:
 1. Flask app receives HTTP request to execute this script
 2. Backend executor spawns this script as subprocess using subprocess.Popen()
-3. Every line printed goes to stdout (captured by dashboard)
+3. Every line written goes to stdout (captured by dashboard)
 4. Dashboard reads logs and displays them in the UI
 5. Progress percentage calculated from step number
 
@@ -43,24 +43,42 @@ To create your own script:
 1. Copy this file: cp backend/sample_script.py backend/my_script.py
 2. Modify the steps list with your own tasks
 3. Add your business logic in the loop
-4. Register in app.py execute_script() function
+4. Register in the SCRIPTS dict in app.py
 5. Add new option to HTML form's scriptType dropdown
 6. Script will be available in dashboard!
 
 IMPORTANT NOTES:
-- Use print() for output (goes to dashboard logs)
+- Write output with sys.stdout.write() (goes to dashboard logs); it skips
+  print()'s argument and separator handling, which counts for scripts that
+  write a lot of lines
+- Call sys.stdout.flush() once per step: when stdout is a pipe, Python
+  holds output back until 8 KB have collected, so without it the dashboard
+  would only see the output when the script ends
 - Use time.sleep() to simulate work
-- Include timestamps with datetime.now()
+- Include timestamps with timestamp() (time.strftime)
 - Return 0 for success, non-zero for failure
 - Avoid interactive input (input() won't work)
-- stderr is also captured (use sys.stderr.write() for errors)
+- stderr is also captured, in the same log (use sys.stderr.write() for errors)
 
 ==============================================================================
 """
 
 import time
 import sys
-from datetime import datetime
+
+# Format of the timestamp at the start of each output line
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def timestamp():
+    """
+    Current local time as text, e.g. "2024-11-16 10:30:01".
+    
+    time.strftime() formats the time directly; datetime.now().strftime()
+    would first build a datetime object just to format it. Scripts that
+    print many lines call this for every line, so that adds up.
+    """
+    return time.strftime(TIMESTAMP_FORMAT)
 
 def main():
     """
@@ -82,9 +100,12 @@ def main():
     RETURNS:
         int: Exit code (0 = success, non-zero = failure)
     """
+    # Look these up once instead of on every line
+    write = sys.stdout.write
+    flush = sys.stdout.flush
     
     # Print header with execution start time
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting sample script execution...")
+    write(f"[{timestamp()}] Starting sample script execution...\n")
     
     # Define the work steps - customize this for your own tasks
     steps = [
@@ -103,12 +124,20 @@ def main():
     # Loop through each step
     # enumerate() provides index (0-based) and step description
     # The 'start=1' parameter makes it 1-based (1-10 instead of 0-9)
+    total = len(steps)
     for i, step in enumerate(steps, 1):
+        # Timestamp taken once per step: every line the step writes
+        # can share it
+        ts = timestamp()
+        
         # Print progress line with:
         # - Current timestamp
         # - Current step number and total (e.g., "[3/10]")
         # - Step description
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] [{i}/{len(steps)}] {step}")
+        write(f"[{ts}] [{i}/{total}] {step}\n")
+        
+        # One flush per step, so the dashboard shows it right away
+        flush()
         
         # Simulate work taking 1 second per step
         # This makes the script take ~10 seconds total (good for testing)
@@ -116,7 +145,7 @@ def main():
         time.sleep(1)
     
     # Print completion summary
-    print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ✓ All steps completed successfully!")
+    write(f"\n[{timestamp()}] ✓ All steps completed successfully!\n")
     
     # Return 0 to indicate successful execution
     # Non-zero values indicate errors (e.g., return 1 for failure)
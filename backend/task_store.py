@@ -0,0 +1,210 @@
+"""
+==============================================================================
+TASK STORE MODULE
+==============================================================================
+Keeps a permanent record of every task in a small SQLite database, so task
+history survives server restarts and isn't limited to the tasks that fit in
+memory.
+
+KEY CONCEPTS:
+- TaskStore: Saves tasks to, and reads them back from, an SQLite file
+- The executor still keeps recent tasks in memory and serves them from
+  there; the store is only written when a task changes status, and only
+  read for tasks that are no longer (or not yet) in memory
+- Script output is not stored here: it is already in each task's log file
+
+WHEN IS A TASK WRITTEN?
+1. Created (status "pending")
+2. Started (status "running")
+3. Finished (status "success" or "failed")
+Progress and output are NOT written as they change: a running task is
+always in memory, so the stored copy is only needed once it has finished
+(or if the server stops before it does, see fail_interrupted()).
+
+WAL MODE:
+journal_mode=WAL lets the API read while a task thread writes, and
+synchronous=NORMAL makes each write a plain file append instead of waiting
+for the disk. A power cut may lose the last few status changes, never the
+database itself.
+
+THREAD SAFETY:
+- One connection, shared by all threads, with self.lock around every use
+==============================================================================
+"""
+
+import sqlite3     # Python's built-in SQLite database
+import threading   # Lock shared by request and task threads
+import orjson      # Storing each task's argument list as JSON
+from typing import Dict, List, Optional  # For type hints
+
+
+# Task fields stored, in column order ("args" is stored as JSON text)
+COLUMNS = (
+    "id", "user_name", "script_path", "args", "status", "progress",
+    "created_at", "started_at", "completed_at", "error", "return_code",
+    "log_file",
+)
+
+# Fields that change after a task is created (see update())
+_UPDATED_COLUMNS = (
+    "status", "progress", "started_at", "completed_at", "error", "return_code",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id           TEXT PRIMARY KEY,
+    user_name    TEXT NOT NULL,
+    script_path  TEXT NOT NULL,
+    args         TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    progress     INTEGER NOT NULL,
+    created_at   TEXT NOT NULL,
+    started_at   TEXT,
+    completed_at TEXT,
+    error        TEXT NOT NULL,
+    return_code  INTEGER,
+    log_file     TEXT NOT NULL
+)
+"""
+
+
+class TaskStore:
+    """
+    SQLite-backed record of all tasks.
+
+    Rows keep SQLite's rowid in insertion order, which is task creation
+    order, so "newest first" is simply ORDER BY rowid DESC.
+
+    ATTRIBUTES:
+        path (str): Database file
+        lock (threading.Lock): Serializes use of the shared connection
+
+    EXAMPLE USAGE:
+        store = TaskStore("logs/tasks.db")
+        store.insert(task)
+        store.update(task)              # After its status changed
+        store.get(task["id"])           # -> dict, or None
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (and if needed create) the database.
+
+        PARAMETERS:
+            path (str): Database file; ":memory:" keeps it in memory only
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+        # check_same_thread=False: the connection is shared by request
+        # threads and task threads (self.lock keeps them from overlapping)
+        # isolation_level=None: every statement commits on its own
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+        # Statements built once
+        self._insert_sql = "INSERT INTO tasks ({}) VALUES ({})".format(
+            ", ".join(COLUMNS), ", ".join("?" * len(COLUMNS))
+        )
+        self._update_sql = "UPDATE tasks SET {} WHERE id = ?".format(
+            ", ".join(f"{column} = ?" for column in _UPDATED_COLUMNS)
+        )
+        self._select_sql = f"SELECT {', '.join(COLUMNS)} FROM tasks"
+
+    def insert(self, task: dict) -> None:
+        """Save a newly created task."""
+        values = [task[column] for column in COLUMNS]
+        values[COLUMNS.index("args")] = orjson.dumps(task["args"]).decode("utf-8")
+        with self.lock:
+            self._db.execute(self._insert_sql, values)
+
+    def update(self, task: dict) -> None:
+        """Save the fields of a task that change while it runs."""
+        values = [task[column] for column in _UPDATED_COLUMNS]
+        values.append(task["id"])
+        with self.lock:
+            self._db.execute(self._update_sql, values)
+
+    def get(self, task_id: str) -> Optional[dict]:
+        """
+        RETURNS:
+            dict: The stored task, or None if there is no such task
+        """
+        with self.lock:
+            row = self._db.execute(f"{self._select_sql} WHERE id = ?", (task_id,)).fetchone()
+        return _row_to_task(row) if row is not None else None
+
+    def get_many(self, task_ids: List[str]) -> Dict[str, dict]:
+        """
+        RETURNS:
+            dict: task_id -> stored task, for the IDs that exist
+        """
+        if not task_ids:
+            return {}
+        placeholders = ", ".join("?" * len(task_ids))
+        with self.lock:
+            rows = self._db.execute(
+                f"{self._select_sql} WHERE id IN ({placeholders})", list(task_ids)
+            ).fetchall()
+        return {row[0]: _row_to_task(row) for row in rows}
+
+    def page(self, limit: int, before: Optional[str] = None) -> List[dict]:
+        """
+        Retrieve one page of tasks, newest first.
+
+        PARAMETERS:
+            limit (int): Maximum number of tasks to return
+            before (str, optional): Only return tasks created before this one
+
+        RETURNS:
+            list: Up to limit tasks. Empty if "before" is not a known task.
+        """
+        with self.lock:
+            if before is None:
+                rows = self._db.execute(
+                    f"{self._select_sql} ORDER BY rowid DESC LIMIT ?", (limit,)
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    f"{self._select_sql} WHERE rowid < (SELECT rowid FROM tasks WHERE id = ?)"
+                    " ORDER BY rowid DESC LIMIT ?",
+                    (before, limit),
+                ).fetchall()
+        return [_row_to_task(row) for row in rows]
+
+    def fail_interrupted(self, completed_at: str) -> int:
+        """
+        Mark tasks left "pending" or "running" as failed.
+
+        Called once when the server starts (see the executor's
+        recover_interrupted()), never by a process that merely opens the
+        database: such tasks belonged to a previous server process that
+        stopped before they finished, so they never will.
+
+        RETURNS:
+            int: How many tasks were marked
+        """
+        with self.lock:
+            cursor = self._db.execute(
+                "UPDATE tasks SET status = 'failed', progress = 100, completed_at = ?,"
+                " error = 'The server stopped before this task finished'"
+                " WHERE status IN ('pending', 'running')",
+                (completed_at,),
+            )
+        return cursor.rowcount
+
+
+def _row_to_task(row: tuple) -> dict:
+    """
+    Turn a database row into a task dict shaped like the executor's.
+
+    Stored tasks have finished changing, so they get version 0, and their
+    output is left empty: it is in the log file.
+    """
+    task = dict(zip(COLUMNS, row))
+    task["args"] = orjson.loads(task["args"])
+    task["output"] = ""
+    task["version"] = 0
+    return task
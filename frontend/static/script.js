@@ -6,7 +6,7 @@
  * This file handles all client-side functionality:
  * - UI interactions (form submission, button clicks)
  * - API communication (fetch requests to Flask backend)
- * - Real-time updates (polling for task progress and logs)
+ * - Real-time updates (polling for task progress, streaming logs)
  * - Dynamic content rendering (tables, progress bars, etc.)
  * 
  * ARCHITECTURE:
@@ -17,8 +17,9 @@
  * KEY PATTERNS:
  * 1. Form Submission: User fills form -> JavaScript captures data -> sends to API
  * 2. Polling: JavaScript calls API every 1 second to get latest status
- * 3. DOM Updates: Received data updates HTML elements dynamically
- * 4. Event Listeners: User actions trigger JavaScript functions
+ * 3. Streaming: Logs are pushed by the server (Server-Sent Events) as they appear
+ * 4. DOM Updates: Received data updates HTML elements dynamically
+ * 5. Event Listeners: User actions trigger JavaScript functions
  * 
  * NO PAGE REFRESH: The entire page is dynamic. No form submission reloads.
  * ==============================================================================
@@ -42,6 +43,30 @@ const API_BASE_URL = '/api';
  */
 const REFRESH_INTERVAL = 1000; // 1 second
 
+/**
+ * TASK_HISTORY_LIMIT: How many of the newest tasks to show in the history table
+ * The server returns tasks one page at a time; this is the page size we ask for
+ */
+const TASK_HISTORY_LIMIT = 50;
+
+/**
+ * FINISHED_STATUSES: Statuses a task never leaves once reached
+ * Anything else ("pending" while waiting for a free worker, "running")
+ * can still change, so the task keeps being refreshed
+ */
+const FINISHED_STATUSES = ['success', 'failed'];
+
+/**
+ * Check whether a task has finished (succeeded or failed).
+ * 
+ * EXAMPLE:
+ *   isFinished('pending')  // false: queued, will still run
+ *   isFinished('failed')   // true
+ */
+function isFinished(status) {
+    return FINISHED_STATUSES.includes(status);
+}
+
 /**
  * currentTaskId: The task ID of the task currently being viewed
  * When user selects a task from history, this is set to that task's ID
@@ -56,6 +81,19 @@ let currentTaskId = null;
  */
 let autoRefreshInterval = null;
 
+/**
+ * logStream: The open EventSource streaming logs for the current task
+ * Stored so we can close it when the user switches to another task
+ * Only one stream is kept open at a time
+ */
+let logStream = null;
+
+/**
+ * logsBuffer: All log text received so far for the current task
+ * New output from the stream is appended here, then shown in the logs panel
+ */
+let logsBuffer = '';
+
 // ==============================================================================
 // SECTION 2: DOM ELEMENT REFERENCES
 // ==============================================================================
@@ -243,13 +281,13 @@ function showNotification(message, type = 'info') {
 }
 
 /**
- * Abbreviate a UUID to show first 8 characters.
+ * Abbreviate a task ID to show first 8 characters.
  * 
- * UUIDs are long (36 characters). In UI tables, showing full UUIDs wastes space.
+ * Task IDs are long (32 hex characters). In UI tables, showing full IDs wastes space.
  * This shows just the first 8 characters which are usually enough to identify.
  * 
  * EXAMPLE:
- *   abbreviateId("550e8400-e29b-41d4-a716-446655440000")
+ *   abbreviateId("550e8400e29b41d4a716446655440000")
  *   // Returns: "550e8400..."
  */
 function abbreviateId(id) {
@@ -474,10 +512,10 @@ async function getTask(taskId) {
 }
 
 /**
- * Get all tasks from the server.
+ * Get the most recent tasks from the server.
  * 
  * Used to populate the task history table.
- * Returns list of all tasks ever created.
+ * Returns the newest TASK_HISTORY_LIMIT tasks, newest first.
  * 
  * RETURNS:
  *   array: Array of task objects (empty array if error)
@@ -490,7 +528,7 @@ async function getTask(taskId) {
  */
 async function getAllTasks() {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks`);
+        const response = await fetch(`${API_BASE_URL}/tasks?limit=${TASK_HISTORY_LIMIT}`);
         const data = await response.json();
 
         if (!data.success) {
@@ -508,7 +546,8 @@ async function getAllTasks() {
  * Get execution logs for a task.
  * 
  * Returns the complete output of the script as a string.
- * Called repeatedly during execution to get streaming logs.
+ * Used by the Copy and Download buttons. Fetches the plain-text endpoint,
+ * which the server sends gzip-compressed (the browser unpacks it for us).
  * 
  * PARAMETERS:
  *   taskId (string): Task ID whose logs to retrieve
@@ -524,14 +563,13 @@ async function getAllTasks() {
  */
 async function getTaskLogs(taskId) {
     try {
-        const response = await fetch(`${API_BASE_URL}/tasks/${taskId}/logs`);
-        const data = await response.json();
+        const response = await fetch(`${API_BASE_URL}/tasks/${taskId}/logs/raw`);
 
-        if (!data.success) {
+        if (!response.ok) {
             return '';
         }
 
-        return data.logs;
+        return await response.text();
     } catch (error) {
         console.error('Error fetching logs:', error);
         return '';
@@ -586,8 +624,8 @@ function updateExecutionStatus(task) {
     completedAtSpan.textContent = formatDate(task.completed_at);
 
     // Update execute button state
-    if (task.status === 'running') {
-        // Disable button while running
+    if (!isFinished(task.status)) {
+        // Disable button while queued or running
         executeBtn.disabled = true;
         executeBtn.innerHTML = '<span class="spinner"></span> Executing...';
     } else {
@@ -598,26 +636,57 @@ function updateExecutionStatus(task) {
 }
 
 /**
- * Update the logs display with current task logs.
+ * Stream logs for a task using Server-Sent Events (EventSource).
  * 
- * Fetches latest logs from API and displays them in the logs container.
- * Automatically scrolls to bottom so user sees latest output.
+ * Opens ONE long-lived connection to the server. The server first sends
+ * everything logged so far, then pushes only new output as the script
+ * prints it. This replaces fetching the whole log every second.
  * 
  * PARAMETERS:
- *   taskId (string): Task ID whose logs to display
+ *   taskId (string): Task ID whose logs to stream
+ * 
+ * STREAM EVENTS:
+ *   open    - (Re)connected: server will resend the full snapshot, so reset
+ *   message - New log text in JSON: {"logs": "...", "offset": 123};
+ *             the text is appended to the panel
+ *   done    - Task finished and all output delivered; close the connection
  * 
  * EXAMPLE:
- *   await updateLogs(currentTaskId);  // Shows latest logs
+ *   streamLogs(currentTaskId);  // Logs panel now updates live
  */
-async function updateLogs(taskId) {
-    // Fetch latest logs from API
-    const logs = await getTaskLogs(taskId);
-    
-    // Update the logs content
-    logsContent.textContent = logs || 'No logs available yet...';
-    
-    // Scroll to bottom so user sees latest output
-    logsContent.scrollTop = logsContent.scrollHeight;
+function streamLogs(taskId) {
+    // Close any stream left open for a previously viewed task
+    stopLogStream();
+
+    logStream = new EventSource(`${API_BASE_URL}/tasks/${taskId}/logs/stream`);
+
+    // Every (re)connection starts with a full snapshot, so start from scratch
+    logStream.onopen = () => {
+        logsBuffer = '';
+    };
+
+    // Append new output and scroll so the user sees the latest line
+    logStream.onmessage = (event) => {
+        logsBuffer += JSON.parse(event.data).logs;
+        logsContent.textContent = logsBuffer || 'No logs available yet...';
+        logsContent.scrollTop = logsContent.scrollHeight;
+    };
+
+    // Server signals the task is finished; nothing more will arrive
+    logStream.addEventListener('done', stopLogStream);
+}
+
+/**
+ * Close the current log stream, if one is open.
+ * 
+ * Called when switching tasks or when the server says the task is done.
+ * Without closing, the browser would automatically reconnect forever.
+ */
+function stopLogStream() {
+    if (logStream) {
+        logStream.close();
+        logStream = null;
+    }
 }
 
 /**
@@ -692,21 +761,22 @@ function updateTaskHistory(tasks) {
  * 1. Sets currentTaskId so we know which task is selected
  * 2. Stops previous auto-refresh timer
  * 3. Fetches and displays task status
- * 4. Fetches and displays logs
- * 5. Starts auto-refresh if task is still running
+ * 4. Streams logs (server pushes new output while the task runs)
+ * 5. Starts auto-refresh of the status if task is still pending or running
  * 
  * PARAMETERS:
  *   taskId (string): Task ID to select and view
  * 
  * AUTO-REFRESH:
- *   While task is running, this calls getTask() and updateLogs() every
- *   REFRESH_INTERVAL (1 second). When task completes, it stops the timer.
+ *   Until the task finishes, this calls getTask() every REFRESH_INTERVAL
+ *   (1 second). When task completes, it stops the timer. Logs do not need
+ *   polling: the log stream keeps the logs panel up to date.
  * 
  * EXAMPLE:
  *   User clicks a task row
  *   -> selectTask('abc123...') called
  *   -> Task details appear
- *   -> If still running, refreshes every second
+ *   -> If still pending or running, refreshes every second
  */
 async function selectTask(taskId) {
     currentTaskId = taskId;
@@ -720,19 +790,19 @@ async function selectTask(taskId) {
     const task = await getTask(taskId);
     if (task) {
         updateExecutionStatus(task);  // Update status panel
-        await updateLogs(taskId);      // Display logs
+        streamLogs(taskId);            // Display logs (live while running)
 
-        // Start auto-refresh if task is running
-        if (task.status === 'running') {
+        // Start auto-refresh if task hasn't finished (a "pending" task
+        // is waiting for a free worker and will start running later)
+        if (!isFinished(task.status)) {
             // Set timer to refresh every REFRESH_INTERVAL ms
             autoRefreshInterval = setInterval(async () => {
                 const updatedTask = await getTask(taskId);
                 if (updatedTask) {
                     updateExecutionStatus(updatedTask);  // Update status
-                    await updateLogs(taskId);             // Update logs
 
                     // Stop refreshing if task completed
-                    if (updatedTask.status !== 'running') {
+                    if (isFinished(updatedTask.status)) {
                         clearInterval(autoRefreshInterval);
                     }
                 }
@@ -817,18 +887,24 @@ executionForm.addEventListener('submit', async (e) => {
         updateExecutionStatus(task);
         showNotification('Script execution started!', 'success');
 
+        // Stream the new task's logs as they are written
+        streamLogs(task.id);
+
         // Start monitoring the task
+        if (autoRefreshInterval) {
+            clearInterval(autoRefreshInterval);
+        }
         autoRefreshInterval = setInterval(async () => {
             const updatedTask = await getTask(task.id);
             if (updatedTask) {
                 updateExecutionStatus(updatedTask);
-                await updateLogs(task.id);
 
                 // Refresh history table
                 await refreshTaskHistory();
 
-                // Stop monitoring if task completed
-                if (updatedTask.status !== 'running') {
+                // Stop monitoring if task completed (not while it is
+                // still "pending", waiting for a free worker)
+                if (isFinished(updatedTask.status)) {
                     clearInterval(autoRefreshInterval);
                     showNotification(`Task ${updatedTask.status}!`, 
                         updatedTask.status === 'success' ? 'success' : 'error');
@@ -845,11 +921,12 @@ executionForm.addEventListener('submit', async (e) => {
 /**
  * Refresh logs button click handler.
  * 
- * Manually fetch latest logs without waiting for auto-refresh.
+ * Reopens the log stream, which resends the full log from the start.
+ * Useful if the connection dropped or the panel looks out of date.
  */
-refreshLogsBtn.addEventListener('click', async () => {
+refreshLogsBtn.addEventListener('click', () => {
     if (currentTaskId) {
-        await updateLogs(currentTaskId);
+        streamLogs(currentTaskId);
         showNotification('Logs refreshed', 'info');
     }
 });